@@ -0,0 +1,447 @@
+"""
+ベンチマーク：全ステージ（settings.MAP_CONFIG）を決まった入力で回し、結果を JSON に書き出す。
+同じ条件で2回取った JSON を --compare で並べれば、変更の前後で速くなったか・遅くなったかが分かる。
+
+  python benchmark.py physics --seconds 10 --out before.json
+  （変更後）
+  python benchmark.py physics --seconds 10 --out after.json --compare before.json
+  python benchmark.py render --frames 120 --out render.json
+
+physics: 各ステージを load_stage（load_map_from_csv → MapManager.create_map）で読み込み、
+         headless.walk_right の入力で固定ステップ（1 / sim_hz 秒）の _update_playing_scene を seconds 秒ぶん回す。
+         クリアしたらステージを読み込み直して続けるので、どのステージも同じステップ数の物理を回す。
+         ステップ数/秒・1ステップの処理時間（p50 / p99）・1ステップあたりのメモリ確保（一時的な使用量の最大と、残ったブロック数）を測る。
+         メモリ確保は tracemalloc を使うと処理時間が大きく狂うので、時間を測る回とは別にもう1回回して測る。
+render : ダミーのビデオドライバで Game.draw を回し、場面ごとに1フレームの描画時間（p50 / p90 / p99）と
+         1フレームあたりの blit 回数・Surface 生成数・文字の描画数（TextCache のミス）を測る。
+         場面は全ステージのプレイ画面・セレクト画面の各チャプタータブ・ポーズ画面・STAGE CLEAR 演出・タッチ端末の仮想キー。
+         数える回（キャッシュが空の状態から）と時間を測る回（キャッシュが温まった状態）を分けて、同じ場面を2回ずつ回す。
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # 標準出力は結果の JSON だけにする
+import pygame
+
+import headless
+from settings import MAP_CONFIG
+
+
+def percentile(values, p):
+    """values（ソート済み）の p パーセンタイル（最近傍法）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def _load(game, stage_id):
+    game.scene = "PLAYING"
+    game.is_paused = False
+    start = time.perf_counter()
+    game.load_stage(stage_id)
+    return time.perf_counter() - start
+
+
+def _physics_inputs(game, stage_id, total, inputs):
+    """
+    total ステップ分の入力を順に返す。クリアしたらステージを読み込み直して続ける
+    （クリア後の _update_playing_scene は何もせずに戻るので、それを測ってもステージどうしを比べられない）。
+    """
+    step = 0
+    for _ in range(total):
+        if game.is_cleared:
+            game.load_stage(stage_id)
+            step = 0
+        yield inputs(game, step)
+        step += 1
+
+
+def bench_physics_stage(game, stage_id, seconds, inputs=headless.walk_right):
+    """1ステージ分の物理演算を測る。どのステージも、クリアを挟みながら同じステップ数の物理を回す"""
+    dt = 1.0 / game.sim_hz
+    total = int(seconds * game.sim_hz)
+    update = game._update_playing_scene
+    clock = time.perf_counter_ns
+
+    # 1回目：処理時間
+    load_time = _load(game, stage_id)
+    samples = []
+    clears = 0
+    steps_to_clear = None
+    for state in _physics_inputs(game, stage_id, total, inputs):
+        t0 = clock()
+        update(state, dt)
+        samples.append(clock() - t0)
+        if game.is_cleared:
+            clears += 1
+            if steps_to_clear is None:
+                steps_to_clear = len(samples)
+    elapsed = sum(samples) / 1e9
+    player = [game.player.rect.x, game.player.rect.y, game.player.is_big]
+
+    # 2回目：メモリ確保（同じ入力なので同じ経路を通る）
+    # ステップごとに記録を空にしてから回し、ステップ中の使用量の最大と、ステップ後も残っているブロック数を取る
+    # （CPython には確保の総回数を数える手段がないので、一時的な確保は peak の大きさで見る）
+    _load(game, stage_id)
+    peak_bytes = 0
+    retained_blocks = 0
+    tracemalloc.start()
+    for state in _physics_inputs(game, stage_id, total, inputs):
+        tracemalloc.clear_traces()
+        tracemalloc.reset_peak()
+        update(state, dt)
+        peak_bytes += tracemalloc.get_traced_memory()[1]
+        retained_blocks += len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "stage": stage_id,
+        "steps": total,
+        "load_ms": round(load_time * 1000, 3),
+        "steps_per_sec": round(total / elapsed, 1) if elapsed > 0 else None,
+        "p50_us": round(percentile(samples, 50) / 1000, 2),
+        "p99_us": round(percentile(samples, 99) / 1000, 2),
+        "max_us": round(samples[-1] / 1000, 2) if samples else 0.0,
+        # 1ステップ中に新しく確保したメモリの、最も多かった時点の量（バイト）の平均（確保してすぐ解放した分も含む）
+        "peak_bytes_per_step": round(peak_bytes / total, 1) if total else 0.0,
+        # 1ステップ中に確保し、ステップが終わっても解放されていないメモリブロック数の平均
+        "retained_blocks_per_step": round(retained_blocks / total, 2) if total else 0.0,
+        "clears": clears,
+        "steps_to_clear": steps_to_clear,
+        "player": player,
+    }
+
+
+def run_physics(stages, seconds):
+    game = headless.create_game()
+    results = []
+    for stage_id in stages:
+        result = bench_physics_stage(game, stage_id, seconds)
+        print(f"{stage_id:<14} {result['steps_per_sec']:>10.1f} steps/s  "
+              f"p50 {result['p50_us']:>8.2f} us  p99 {result['p99_us']:>8.2f} us  "
+              f"peak {result['peak_bytes_per_step']:>8.1f} B/step  "
+              f"retained {result['retained_blocks_per_step']:>6.2f} blocks/step", file=sys.stderr)
+        results.append(result)
+    return {
+        "suite": "physics",
+        "params": {"seconds": seconds, "sim_hz": game.sim_hz, "inputs": "walk_right"},
+        "env": _environment(),
+        "stages": results,
+    }
+
+
+def _environment():
+    return {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# ---------------------------------------------------------------- render
+
+RENDER_DT = 1 / 60
+TRANSFORM_FUNCS = ("scale", "smoothscale", "scale_by", "smoothscale_by", "rotate", "rotozoom", "flip", "scale2x")
+DEST_ARG = {"scale": 2, "smoothscale": 2, "scale2x": 1}  # 拡縮先を渡せる関数と、その引数の位置（渡した場合は新しい Surface を作らない）
+
+
+class DrawCounter:
+    """
+    with の間、blit の回数と Surface の生成数を数える。
+    pygame.Surface を数える派生クラスに、pygame.transform の関数を数える版に差し替え、
+    game_canvas も数える版に入れ替える（抜けると元に戻る）。
+    Surface は Python から pygame.Surface() / transform.* で作ったものと、数える版の copy() を数える。
+    font.render は TextCache のミス数として別に数える。
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.blits = 0
+        self.surfaces = 0
+        self.text_renders = 0
+        self._saved = {}
+
+    def __enter__(self):
+        counter = self
+        base = pygame.Surface
+
+        class CountingSurface(base):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                counter.surfaces += 1
+
+            def blit(self, *args, **kwargs):
+                counter.blits += 1
+                return super().blit(*args, **kwargs)
+
+            def blits(self, seq, *args, **kwargs):
+                seq = list(seq)
+                counter.blits += len(seq)
+                return super().blits(seq, *args, **kwargs)
+
+            def fblits(self, seq, *args, **kwargs):
+                seq = list(seq)
+                counter.blits += len(seq)
+                return super().fblits(seq, *args, **kwargs)
+
+            def copy(self):
+                counter.surfaces += 1
+                return super().copy()
+
+        def counting(name, func):
+            def wrapper(*args, **kwargs):
+                pos = DEST_ARG.get(name)
+                if pos is None or (len(args) <= pos and "dest_surface" not in kwargs):
+                    counter.surfaces += 1
+                return func(*args, **kwargs)
+            return wrapper
+
+        self._saved = {"Surface": base, "canvas": self.game.game_canvas}
+        for name in TRANSFORM_FUNCS:
+            func = getattr(pygame.transform, name, None)
+            if func is not None:
+                self._saved[name] = func
+                setattr(pygame.transform, name, counting(name, func))
+        pygame.Surface = CountingSurface
+
+        canvas = self.game.game_canvas
+        counting_canvas = CountingSurface(canvas.get_size(), 0, canvas)
+        base.blit(counting_canvas, canvas, (0, 0))
+        self.game.game_canvas = counting_canvas
+        self.reset()
+        return self
+
+    def __exit__(self, *exc):
+        pygame.Surface = self._saved.pop("Surface")
+        self.game.game_canvas = self._saved.pop("canvas")
+        for name, func in self._saved.items():
+            setattr(pygame.transform, name, func)
+        self._saved = {}
+
+    def reset(self):
+        self.blits = self.surfaces = 0
+        self._text_misses = self.game.text_cache.misses
+
+    def take(self):
+        """前回から数えた値を返し、0 から数え直す"""
+        self.text_renders = self.game.text_cache.misses - self._text_misses
+        counts = (self.blits, self.surfaces, self.text_renders)
+        self.reset()
+        return counts
+
+
+def create_render_game():
+    """画像・フォントを読み込んだ（ヘッドレスでない）Game を、ダミーのビデオドライバで作る"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import main
+    game = main.Game()
+    game.save_game = lambda: None  # 測定中にセーブデータを書き換えない
+    # セレクト画面の開放状態を揃える（草原は全部・森は半分クリア済み）
+    game.cleared_stages = {f"grassland_{i:02}": 1 for i in range(1, 11)}
+    game.cleared_stages.update({f"forest_{i:02}": 1 for i in range(1, 6)})
+    game.progress_version += 1
+    return game
+
+
+def _enter_stage(game, stage_id, touch=False):
+    game.is_touch_device = touch
+    game.scene = "PLAYING"
+    game.is_paused = False
+    game.load_stage(stage_id)
+
+
+def _play_frames(game, stage_id, touch=False):
+    """プレイ画面：walk_right の入力で進めながら描く"""
+    _enter_stage(game, stage_id, touch)
+    step = 0
+    while True:
+        game._step_playing_scene(headless.walk_right(game, step), RENDER_DT)
+        step += 1
+        yield
+
+
+def _select_frames(game, chapter_idx, touch=False):
+    """セレクト画面：タブを固定し、選択中のステージとフォーカスを順に動かす"""
+    game.is_touch_device = touch
+    game.scene = "SELECT"
+    game.is_paused = False
+    game.current_chapter_idx = chapter_idx
+    frame = 0
+    while True:
+        game.select_stage_idx = (frame // 6) % 10
+        game.focus_target = "CHAPTER" if (frame // 60) % 2 else "STAGE"
+        frame += 1
+        yield
+
+
+def _pause_frames(game, stage_id):
+    _enter_stage(game, stage_id)
+    game.draw(RENDER_DT)  # ポーズの背景になるプレイ画面
+    game.is_paused = True
+    while True:
+        yield
+
+
+def _clear_frames(game, stage_id):
+    """STAGE CLEAR 演出：クリアした瞬間から1フレームずつ時間を進める"""
+    _enter_stage(game, stage_id)
+    game.is_cleared = True
+    game.player.state = "CLEAR"
+    frame = 0
+    while True:
+        game.clear_start_ticks = pygame.time.get_ticks() - int(frame * RENDER_DT * 1000)
+        frame += 1
+        yield
+
+
+def render_scenes(game, stages):
+    """(場面名, フレームを進める generator を作る関数) のリスト"""
+    scenes = [(f"play:{sid}", lambda sid=sid: _play_frames(game, sid)) for sid in stages]
+    scenes += [(f"select:{name}", lambda i=i: _select_frames(game, i)) for i, name in enumerate(game.chapters)]
+    scenes += [
+        ("pause", lambda: _pause_frames(game, stages[0])),
+        ("clear", lambda: _clear_frames(game, stages[0])),
+        ("touch:play", lambda: _play_frames(game, stages[0], touch=True)),
+        ("touch:select", lambda: _select_frames(game, 0, touch=True)),
+    ]
+    return scenes
+
+
+def bench_render_scene(game, name, make_frames, frames):
+    # 1回目：数える（キャッシュが空の状態から）
+    counts = []
+    with DrawCounter(game) as counter:
+        scene = make_frames()
+        for _ in range(frames):
+            next(scene)
+            counter.reset()
+            game.draw(RENDER_DT)
+            counts.append(counter.take())
+
+    # 2回目：時間を測る（同じ場面を最初から）
+    clock = time.perf_counter_ns
+    samples = []
+    scene = make_frames()
+    for _ in range(frames):
+        next(scene)
+        t0 = clock()
+        game.draw(RENDER_DT)
+        samples.append(clock() - t0)
+    game.is_touch_device = False
+
+    samples.sort()
+    blits, surfaces, texts = zip(*counts) if counts else ((0,), (0,), (0,))
+    ms = lambda ns: round(ns / 1e6, 3)
+    return {
+        "scene": name,
+        "frames": frames,
+        "p50_ms": ms(percentile(samples, 50)),
+        "p90_ms": ms(percentile(samples, 90)),
+        "p99_ms": ms(percentile(samples, 99)),
+        "max_ms": ms(samples[-1]) if samples else 0.0,
+        "blits_per_frame": round(sum(blits) / frames, 1) if frames else 0.0,
+        "surfaces_per_frame": round(sum(surfaces) / frames, 2) if frames else 0.0,
+        "text_renders_per_frame": round(sum(texts) / frames, 2) if frames else 0.0,
+        # 最初のフレーム（キャッシュが空）と、それ以降で最も多かったフレーム
+        "first_frame": {"blits": blits[0], "surfaces": surfaces[0], "text_renders": texts[0]},
+        "max_surfaces_after_first": max(surfaces[1:], default=0),
+    }
+
+
+def run_render(stages, frames):
+    game = create_render_game()
+    results = []
+    for name, make_frames in render_scenes(game, stages):
+        result = bench_render_scene(game, name, make_frames, frames)
+        print(f"{name:<20} p50 {result['p50_ms']:>7.3f} ms  p99 {result['p99_ms']:>7.3f} ms  "
+              f"blits {result['blits_per_frame']:>7.1f}  surfaces {result['surfaces_per_frame']:>6.2f}  "
+              f"text {result['text_renders_per_frame']:>5.2f} /frame", file=sys.stderr)
+        results.append(result)
+    return {
+        "suite": "render",
+        "params": {"frames": frames, "window": list(game.screen.get_size()), "scale_mode": game.viewport.mode},
+        "env": _environment(),
+        "scenes": results,
+    }
+
+
+# 比較する指標と、値が大きい方が良いかどうか
+COMPARE_KEYS = {
+    "physics": (("steps_per_sec", True), ("p99_us", False), ("peak_bytes_per_step", False), ("retained_blocks_per_step", False)),
+    "render": (("p50_ms", False), ("p99_ms", False), ("blits_per_frame", False), ("surfaces_per_frame", False)),
+}
+# 結果の行が入っているキーと、行の名前のキー
+ROWS = {"physics": ("stages", "stage"), "render": ("scenes", "scene")}
+
+
+def compare(base, new):
+    """同じスイートの結果2つを、ステージごとに変化率（%）で並べた文字列にする"""
+    keys = COMPARE_KEYS.get(new["suite"], ())
+    if base.get("suite") != new["suite"]:
+        return f"スイートが違うので比較できません: {base.get('suite')} / {new['suite']}"
+    rows_key, name_key = ROWS[new["suite"]]
+    base_rows = {r[name_key]: r for r in base[rows_key]}
+    lines = [name_key.ljust(20) + "".join(f"{key:>28}" for key, _ in keys)]
+    for row in new[rows_key]:
+        old = base_rows.get(row[name_key])
+        if old is None:
+            continue
+        cells = []
+        for key, higher_is_better in keys:
+            a, b = old.get(key), row.get(key)
+            if not a or b is None:
+                cells.append(f"{'-':>28}")
+                continue
+            change = (b - a) / a * 100
+            # 良くなった方向なら *、悪くなった方向なら !（±1% 未満は印なし）
+            mark = " " if abs(change) < 1 else ("*" if (change > 0) == higher_is_better else "!")
+            cells.append(f"{a:>9g} -> {b:<9g}{change:+5.0f}%{mark}")
+        lines.append(row[name_key].ljust(20) + "".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="全ステージのベンチマーク")
+    parser.add_argument("suite", choices=["physics", "render"], help="測る対象")
+    parser.add_argument("--stage", action="append", choices=list(MAP_CONFIG), help="測るステージ（複数指定可。省略時は全ステージ）")
+    parser.add_argument("--seconds", type=float, default=10.0, help="physics: 1ステージあたりのシミュレーション時間（秒）")
+    parser.add_argument("--frames", type=int, default=120, help="render: 1場面あたりの描画フレーム数")
+    parser.add_argument("--out", help="結果を書き出す JSON ファイル（省略時は標準出力）")
+    parser.add_argument("--compare", metavar="JSON", help="以前の結果と比べる")
+    args = parser.parse_args(argv)
+
+    # main.py は読み込み時に作業ディレクトリを移すので、パスは先に絶対パスにしておく
+    out = os.path.abspath(args.out) if args.out else None
+    base = os.path.abspath(args.compare) if args.compare else None
+    stages = args.stage or list(MAP_CONFIG)
+    # ゲーム側のメッセージ（ロード結果など）は標準エラーへ回し、標準出力は結果の JSON だけにする
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.suite == "physics":
+            report = run_physics(stages, args.seconds)
+        else:
+            report = run_render(stages, args.frames)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if base:
+        with open(base, encoding="utf-8") as f:
+            print(compare(json.load(f), report), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,230 @@
+import pygame
+from settings import GRID_SIZE
+
+
+def _rect_of(item):
+    """{'rect': Rect} 形式・Rect・.rect を持つオブジェクトのいずれからも Rect を取り出す"""
+    if isinstance(item, dict):
+        return item['rect']
+    if isinstance(item, pygame.Rect):
+        return item
+    return item.rect
+
+
+def first_contact(start, end, items):
+    """
+    start から end へ（1軸方向に）動く矩形が、途中で最初に接触する矩形を返す（swept AABB）。
+    1回の移動量が相手の厚みより大きくても、すり抜けずに手前の相手を見つけられる。
+    start の時点で既に重なっている相手は対象外（従来の重なり解消に任せる）。接触しなければ None。
+    """
+    sweep = start.union(end)
+    dx, dy = end.x - start.x, end.y - start.y
+    best, best_dist = None, None
+    for item in items:
+        r = _rect_of(item)
+        if not sweep.colliderect(r) or start.colliderect(r):
+            continue
+        # 進行方向の手前側の面までの距離
+        if dx > 0:   dist = r.left - start.right
+        elif dx < 0: dist = start.left - r.right
+        elif dy > 0: dist = r.top - start.bottom
+        elif dy < 0: dist = start.top - r.bottom
+        else:
+            continue
+        if best is None or dist < best_dist:
+            best, best_dist = r, dist
+    return best
+
+
+def merge_solid_rects(rects, cell_size=GRID_SIZE):
+    """
+    グリッドに沿った矩形群を、同じ領域を覆うより少ない矩形にまとめる。
+    横方向の連続セルを1本にまとめた後、同じ幅の帯が縦に続く場合はさらに結合する。
+    """
+    occupied = set()
+    for r in rects:
+        for cy in range(r.top // cell_size, r.bottom // cell_size):
+            for cx in range(r.left // cell_size, r.right // cell_size):
+                occupied.add((cx, cy))
+    if not occupied:
+        return []
+
+    # 1. 行ごとの横ラン (x0, x1) を求める
+    rows = {}
+    for cx, cy in sorted(occupied, key=lambda c: (c[1], c[0])):
+        runs = rows.setdefault(cy, [])
+        if runs and runs[-1][1] == cx:
+            runs[-1][1] = cx + 1
+        else:
+            runs.append([cx, cx + 1])
+
+    # 2. 直上の行に同じ横ランがあれば縦に伸ばす
+    merged = []
+    open_runs = {}  # (x0, x1) -> [x0, y0, x1, y1]
+    for cy in sorted(rows):
+        next_open = {}
+        for x0, x1 in rows[cy]:
+            box = open_runs.pop((x0, x1), None)
+            if box is not None and box[3] == cy:
+                box[3] = cy + 1
+            else:
+                box = [x0, cy, x1, cy + 1]
+            next_open[(x0, x1)] = box
+        merged.extend(open_runs.values())
+        open_runs = next_open
+    merged.extend(open_runs.values())
+
+    merged.sort(key=lambda b: (b[1], b[0]))
+    return [pygame.Rect(x0 * cell_size, y0 * cell_size,
+                        (x1 - x0) * cell_size, (y1 - y0) * cell_size)
+            for x0, y0, x1, y1 in merged]
+
+
+class SpatialGrid:
+    """GRID_SIZE 単位のセルに矩形を登録し、指定した AABB と重なる候補だけを返す一様グリッド"""
+
+    def __init__(self, cell_size=GRID_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}     # (cx, cy) -> [登録番号, ...]
+        self.entries = {}   # 登録番号 -> item
+        self.order = {}     # id(item) -> 登録番号
+        self._next = 0
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.order.clear()
+        self._next = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _cell_range(self, rect):
+        cs = self.cell_size
+        x0 = rect.left // cs
+        y0 = rect.top // cs
+        x1 = (max(rect.left, rect.right - 1)) // cs
+        y1 = (max(rect.top, rect.bottom - 1)) // cs
+        return x0, y0, x1, y1
+
+    def insert(self, item):
+        idx = self._next
+        self._next += 1
+        self.entries[idx] = item
+        self.order[id(item)] = idx
+
+        x0, y0, x1, y1 = self._cell_range(_rect_of(item))
+        cells = self.cells
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [idx]
+                else:
+                    bucket.append(idx)
+
+    def remove(self, item):
+        idx = self.order.pop(id(item), None)
+        if idx is None:
+            return
+        del self.entries[idx]
+
+        x0, y0, x1, y1 = self._cell_range(_rect_of(item))
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket and idx in bucket:
+                    bucket.remove(idx)
+
+    def query(self, area):
+        """area と重なるセルに登録された item を登録順で返す（衝突解決の順序を全走査時と揃えるため）"""
+        x0, y0, x1, y1 = self._cell_range(area)
+        cells = self.cells
+        found = set()
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+
+        entries = self.entries
+        result = []
+        for idx in sorted(found):
+            item = entries[idx]
+            if area.colliderect(_rect_of(item)):
+                result.append(item)
+        return result
+
+
+class CollisionWorld:
+    """
+    ステージの当たり判定を名前付きレイヤーで保持する衝突ワールド。
+    レイヤーの有効/無効はフラグ（大きさ・ドアの施錠）で切り替え、
+    内容が変わったレイヤー（レンガ破壊・ドア解錠）だけを dirty として次の問い合わせ時に作り直す。
+    """
+    STATIC = "static"
+    BRICKS = "bricks"
+    DOORS = "doors"
+    LARGE_ONLY = "large_only"
+    SMALL_ONLY = "small_only"
+    PLATFORMS = "platforms"
+
+    def __init__(self):
+        self.layers = {}    # name -> item のリスト（MapManager のリストをそのまま参照）
+        self.grids = {}     # name -> SpatialGrid
+        self.dirty = set()
+        self.block_entries = []  # 押せるブロック（動的レイヤー）の {'rect': pb.rect}
+        self.is_big = True
+        self.doors_locked = True
+        self._update_active_layers()
+
+    def reset(self, layers, pushable_blocks):
+        self.layers = dict(layers)
+        self.grids = {name: SpatialGrid() for name in self.layers}
+        self.dirty = set(self.layers)
+        # Rect はブロック側で直接書き換えられるので、ラップは一度だけ作れば良い
+        self.block_entries = [{'rect': pb.rect} for pb in pushable_blocks]
+
+    def mark_dirty(self, name):
+        self.dirty.add(name)
+
+    def set_flags(self, is_big, doors_locked):
+        if is_big == self.is_big and doors_locked == self.doors_locked:
+            return
+        self.is_big = is_big
+        self.doors_locked = doors_locked
+        self._update_active_layers()
+
+    def _update_active_layers(self):
+        toggle = self.LARGE_ONLY if self.is_big else self.SMALL_ONLY
+        # プレイヤー：鍵がない間だけドアが壁になる
+        if self.doors_locked:
+            self.player_layers = (self.STATIC, self.BRICKS, self.DOORS, toggle)
+        else:
+            self.player_layers = (self.STATIC, self.BRICKS, toggle)
+        # 押せるブロック：ドアは常に壁
+        self.block_layers = (self.STATIC, self.BRICKS, self.DOORS, toggle)
+
+    def _grid(self, name):
+        grid = self.grids[name]
+        if name in self.dirty:
+            grid.clear()
+            for item in self.layers[name]:
+                grid.insert(item)
+            self.dirty.discard(name)
+        return grid
+
+    def query(self, area, *layers):
+        """area (AABB) と重なる矩形を、指定したレイヤーの順に連結して返す"""
+        if len(layers) == 1:
+            return self._grid(layers[0]).query(area)
+        result = []
+        for name in layers:
+            result.extend(self._grid(name).query(area))
+        return result
+
+    def query_player(self, area):
+        return self.query(area, *self.player_layers)
+
+    def query_block(self, area):
+        return self.query(area, *self.block_layers)
@@ -0,0 +1,59 @@
+import pygame
+
+
+def merge_overlapping(rects):
+    """重なっている（接している）矩形同士を1つにまとめ、互いに重ならない矩形のリストにする"""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        # まとめた結果が別の矩形と新たに重なることがあるので、重ならなくなるまで繰り返す
+        while True:
+            idx = rect.collidelist([m.inflate(2, 2) for m in merged])
+            if idx < 0:
+                break
+            rect.union_ip(merged.pop(idx))
+        merged.append(rect)
+    return merged
+
+
+class DirtyRegions:
+    """
+    差分描画用に、前フレームから変わった範囲（キャンバス座標）を集める。
+    各要素は「今回描くもの」を報告し、前回と比べて消えた/現れた/動いたものの範囲が dirty になる。
+    valid が False の間（ステージ読み込み直後・画面サイズ変更後など）は全体を描き直すこと。
+    """
+
+    def __init__(self):
+        self.prev = {}      # 要素名 -> {(id(Surface), 位置): (Rect, Surface)}
+        self.rects = []
+        self.static = None  # 前フレームで使った背景（焼き込み済みの静的レイヤー）
+        self.valid = False
+
+    def invalidate(self):
+        self.prev.clear()
+        self.rects.clear()
+        self.static = None
+        self.valid = False
+
+    def add(self, rect):
+        self.rects.append(pygame.Rect(rect))
+
+    def report(self, name, sprites):
+        """sprites: [(Surface, (x, y)), ...] 今回描く内容。前回から変わった範囲を dirty に加える"""
+        current = {}
+        for img, pos in sprites:
+            # Surface を保持しておくことで、id が別の Surface に再利用されるのを防ぐ
+            current[(id(img), tuple(pos))] = (pygame.Rect(pos, img.get_size()), img)
+        prev = self.prev.get(name, {})
+        if current.keys() != prev.keys():
+            for key in prev.keys() - current.keys():
+                self.rects.append(prev[key][0])
+            for key in current.keys() - prev.keys():
+                self.rects.append(current[key][0])
+        self.prev[name] = current
+
+    def collect(self):
+        """集めた範囲を重ならないようまとめて返し、次のフレーム用に空にする"""
+        rects = merge_overlapping(self.rects)
+        self.rects.clear()
+        return rects
@@ -0,0 +1,62 @@
+import pygame
+import math
+from render_cache import SurfaceCache
+
+CLEAR_SCALE_STEP = 0.02   # pulse_scale の量子化刻み
+CLEAR_CACHE_SIZE = 24     # 拡縮済みフレームの保持上限（登場時の大きいフレームは自然に追い出される）
+
+
+class ClearEffect:
+    """
+    STAGE CLEAR 演出（後光＋テキスト）。
+    後光の楕円とテキストは一度だけ描いておき、量子化した pulse_scale ごとの拡縮結果を使い回す。
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.glow = None
+        self.text = None
+        self.shadow = None
+        self.frames = SurfaceCache(CLEAR_CACHE_SIZE)
+
+    def _build(self):
+        # 1. 後光：14枚の楕円を中心を揃えて1枚に重ねておく
+        max_w, max_h = 300 + 14 * 20, 100 + 14 * 10
+        self.glow = pygame.Surface((max_w, max_h), pygame.SRCALPHA)
+        for r in range(1, 15):
+            alpha = int(100 * (0.7 ** r))
+            ring = pygame.Surface((300 + r*20, 100 + r*10), pygame.SRCALPHA)
+            pygame.draw.ellipse(ring, (255, 200 + r*3, 50, alpha), ring.get_rect())
+            self.glow.blit(ring, ring.get_rect(center=(max_w // 2, max_h // 2)))
+
+        # 2. メインテキスト "STAGE CLEAR!" とシャドウ
+        self.text = self.font.render("STAGE CLEAR!", True, (255, 255, 100))
+        self.shadow = self.font.render("STAGE CLEAR!", True, (50, 20, 0))
+
+    def _scaled(self, scale):
+        def factory():
+            def smooth(surf):
+                w, h = surf.get_size()
+                return pygame.transform.smoothscale(surf, (int(w * scale), int(h * scale)))
+            return smooth(self.glow), smooth(self.text), smooth(self.shadow)
+        return self.frames.get_or_create(scale, factory)
+
+    def draw(self, surface, elapsed_time, center):
+        if self.glow is None:
+            self._build()
+
+        # 登場時のインパクト演出：0.5秒かけて1.5倍から1.0倍に収束しつつ、その後パルス
+        entrance_impact = max(0, 1.0 * math.exp(-elapsed_time * 5)) # 急激に減衰する値
+        pulse_scale = 1.0 + entrance_impact + 0.1 * math.sin(elapsed_time * 8)
+        pulse_scale = round(pulse_scale / CLEAR_SCALE_STEP) * CLEAR_SCALE_STEP
+
+        glow, text, shadow = self._scaled(pulse_scale)
+
+        # 経過時間による後光のフェードイン
+        glow.set_alpha(int(255 * min(1.0, elapsed_time * 2)))
+        surface.blit(glow, glow.get_rect(center=center))
+
+        # テキストも後光と同期してパルス（シャドウを少しずらして描画）
+        txt_rect = text.get_rect(center=center)
+        surface.blit(shadow, (txt_rect.x + 4, txt_rect.y + 4))
+        surface.blit(text, txt_rect)
@@ -0,0 +1,86 @@
+import asyncio
+import sys
+import time
+
+IS_WEB = sys.platform == "emscripten"  # pygbag（ブラウザ）上で動いているか
+VSYNC_FALLBACK_FPS = 240  # vsync 指定時の上限（vsync が実際には効いていなかった場合の空回り防止）
+
+
+class FramePacer:
+    """
+    メインループのフレーム間隔を整える。
+    - 目標 FPS まで、大部分は time.sleep・最後の spin_margin 秒だけ busy-wait して正確に待つ
+      （asyncio.sleep はタイマーの粒度が粗い環境（Windows で約15ms）があり、1フレームを大きく超えてしまうため使わない。
+        待ち終わった後に asyncio.sleep(0) で1回だけ制御を返し、create_task した処理も進むようにする）
+    - vsync 指定時は flip が待ってくれるので、間引き時以外は VSYNC_FALLBACK_FPS の上限だけを設ける
+    - 入力のない待機画面（セレクト・ポーズ・クリア）では idle_fps まで落とす
+    - ブラウザ上では自前で待たず、毎フレーム asyncio.sleep(0) で描画フレームに合わせて制御を返す
+    sleep で CPU を休ませた時間と、busy-wait で空回りした時間を分けて集計し、summary() で確認できる。
+    """
+
+    def __init__(self, target_fps, idle_fps, spin_margin=0.002, vsync=False, web=IS_WEB):
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.spin_margin = spin_margin
+        self.vsync = vsync
+        self.web = web
+        self.deadline = None
+        self.last = time.perf_counter()
+        # 集計
+        self.frames = 0
+        self.idle_frames = 0
+        self.busy_time = 0.0   # フレームの処理に使った時間
+        self.saved_time = 0.0  # sleep で CPU を休ませた時間
+        self.spin_time = 0.0   # busy-wait で空回りした時間
+
+    async def wait(self, idle=False):
+        """1フレーム分の処理が終わった後に呼ぶ。前回からの経過時間（dt, 秒）を返す"""
+        now = time.perf_counter()
+        self.busy_time += now - self.last
+        self.frames += 1
+        if idle:
+            self.idle_frames += 1
+
+        if idle:
+            fps = self.idle_fps
+        elif self.vsync:
+            fps = VSYNC_FALLBACK_FPS
+        else:
+            fps = self.target_fps
+        if self.web or fps <= 0:
+            # 待つのはブラウザに任せ、制御だけ返す
+            self.deadline = None
+            await asyncio.sleep(0)
+            self.saved_time += time.perf_counter() - now
+        else:
+            period = 1.0 / fps
+            if self.deadline is None or now - self.deadline > period:
+                # 初回、または大きく遅れた場合は基準を今に合わせ直す（遅れを取り戻そうと詰めて回さない）
+                self.deadline = now
+            self.deadline += period
+
+            remaining = self.deadline - now
+            if remaining > self.spin_margin:
+                time.sleep(remaining - self.spin_margin)
+            slept = time.perf_counter()
+            self.saved_time += slept - now
+            # sleep の誤差ぶんは busy-wait で詰める
+            while time.perf_counter() < self.deadline:
+                pass
+            self.spin_time += time.perf_counter() - slept
+            # 他のタスク（create_task した効果音の準備など）にも毎フレーム制御を返す
+            await asyncio.sleep(0)
+
+        end = time.perf_counter()
+        dt = end - self.last
+        self.last = end
+        return dt
+
+    def summary(self):
+        if not self.frames:
+            return "frames: 0"
+        total = self.busy_time + self.saved_time + self.spin_time
+        return (f"frames: {self.frames} (idle {self.idle_frames}), "
+                f"busy {self.busy_time / self.frames * 1000:.2f} ms/frame, "
+                f"saved {self.saved_time:.1f} s ({self.saved_time / total * 100 if total else 0:.0f}% of wall time), "
+                f"spin {self.spin_time:.2f} s")
@@ -1,17 +1,26 @@
 import pygame
 import math
-from settings import GRAVITY
+from settings import GRAVITY, GRID_SIZE
+from collision import first_contact
 
 class PushableBlock:
-    def __init__(self, x, y, img_key):
+    def __init__(self, x, y, img_key, img=None):
         self.rect = pygame.Rect(x, y, 64, 64)
         self.pos_x = float(x) # float座標を追加
         self.pos_y = float(y)
         self.img_key = img_key
+        self.img = img # ロード時に解決済みの画像
         self.vel_x = 0.0
         self.vel_y = 0.0
         self.on_ground = False
 
+    def sweep_area(self, dt):
+        """今回の update で到達しうる範囲（衝突候補を絞り込むための AABB）"""
+        frame_ratio = dt * 60.0
+        dx = int(abs(self.vel_x) * frame_ratio) + 1
+        dy = int(12.0 * frame_ratio) + 1 # 終端速度ぶん
+        return self.rect.inflate((dx + GRID_SIZE * 2) * 2, (dy + GRID_SIZE * 2) * 2)
+
     def update(self, obstacles, platforms, dt):
         # 1フレームあたりの比率を算出
         frame_ratio = dt * 60.0
@@ -25,8 +34,17 @@ class PushableBlock:
         if abs(self.vel_x) < 0.1: 
             self.vel_x = 0
 
+        start = self.rect.copy()
         self.pos_x += self.vel_x * frame_ratio
         self.rect.x = int(self.pos_x)
+
+        # 移動の途中で最初に触れる壁で止める（dt が大きくてもすり抜けない）
+        hit = first_contact(start, self.rect, obstacles)
+        if hit:
+            if self.rect.x > start.x: self.rect.right = hit.left
+            else: self.rect.left = hit.right
+            self.vel_x = 0
+            self.pos_x = float(self.rect.x)
         
         for target in obstacles:
             t_rect = target['rect'] if isinstance(target, dict) else target.rect
@@ -45,8 +63,19 @@ class PushableBlock:
         if self.vel_y > 12.0: self.vel_y = 12.0
 
         self.on_ground = False
+        start = self.rect.copy()
         self.pos_y += self.vel_y * frame_ratio
         self.rect.y = int(self.pos_y)
+
+        hit = first_contact(start, self.rect, obstacles)
+        if hit:
+            if self.rect.y > start.y: # 着地
+                self.rect.bottom = hit.top
+                self.on_ground = True
+            else: # 頭打ち
+                self.rect.top = hit.bottom
+            self.vel_y = 0
+            self.pos_y = float(self.rect.y)
         
         for target in obstacles:
             t_rect = target['rect'] if isinstance(target, dict) else target.rect
@@ -60,13 +89,13 @@ class PushableBlock:
                     self.vel_y = 0
                 self.pos_y = float(self.rect.y)
 
-        # すり抜け床判定
+        # すり抜け床判定（移動前の足元が床より上で、移動中に床の上端を通過したら着地）
+        sweep = start.union(self.rect)
         for pf in platforms:
             target_rect = pf if isinstance(pf, pygame.Rect) else pf.rect
             if self.vel_y > 0:
-                if self.rect.colliderect(target_rect):
-                    # 前フレームの足元位置から判定（ここも frame_ratio に合わせる）
-                    if (self.rect.bottom - self.vel_y * frame_ratio) <= target_rect.top + 5:
+                if sweep.colliderect(target_rect):
+                    if start.bottom <= target_rect.top + 5:
                         self.rect.bottom = target_rect.top
                         self.vel_y = 0
                         self.on_ground = True
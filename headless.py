@@ -0,0 +1,100 @@
+"""
+ヘッドレス実行：ウィンドウ・音・画像なしで、プレイ中の物理演算だけを CPU の許す限り速く回す。
+大量のステージを回すバッチ処理やベンチマーク用。
+
+  python main.py --headless                       # 全ステージを既定の入力で10秒ずつ
+  python main.py --headless --stage forest_03 --seconds 30
+  python main.py --replay records/forest_03_xxx.rep   # python main.py --record DIR で記録した入力を再生
+
+Python からは create_game() で Game を作り、simulate() でステージを回す。
+  game = create_game()
+  result = simulate(game, "grassland_01", seconds=10)
+"""
+import argparse
+import json
+import time
+from settings import MAP_CONFIG
+from replay import InputReplay
+
+JUMP_INTERVAL = 0.5  # 既定の入力でジャンプする間隔（秒）
+
+
+def create_game():
+    """ヘッドレスの Game を作る（最初の pygame.init より前に呼ぶこと）"""
+    import main
+    return main.Game(headless=True)
+
+
+def walk_right(game, step):
+    """既定の入力：右へ歩き続け、JUMP_INTERVAL 秒ごとにジャンプする"""
+    state = game._create_empty_input_state()
+    state["hold"]["right"] = True
+    state["trigger"]["jump"] = step % max(1, int(JUMP_INTERVAL * game.sim_hz)) == 0
+    return state
+
+
+def simulate(game, stage_id, seconds, inputs=walk_right, stop_on_clear=True):
+    """
+    stage_id を読み込み、固定ステップ（1 / game.sim_hz 秒）で seconds 秒ぶん物理演算を進める。
+    inputs(game, step) はそのステップの入力（_create_empty_input_state と同じ形）を返す関数。
+    """
+    game.scene = "PLAYING"
+    game.is_paused = False
+    game.load_stage(stage_id)
+
+    dt = 1.0 / game.sim_hz
+    total = int(seconds * game.sim_hz)
+    steps = 0
+    start = time.perf_counter()
+    while steps < total:
+        game._update_playing_scene(inputs(game, steps), dt)
+        steps += 1
+        if stop_on_clear and game.is_cleared:
+            break
+    elapsed = time.perf_counter() - start
+    return _result(game, stage_id, steps, elapsed)
+
+
+def replay(game, path):
+    """記録した入力ファイルを再生し、simulate() と同じ形の結果を返す"""
+    rep = InputReplay.load(path)
+    start = time.perf_counter()
+    steps = rep.play(game)
+    elapsed = time.perf_counter() - start
+    result = _result(game, rep.stage_id, steps, elapsed)
+    result["frames"] = len(rep)
+    return result
+
+
+def _result(game, stage_id, steps, elapsed):
+    return {
+        "stage": stage_id,
+        "steps": steps,
+        "sim_seconds": round(steps / game.sim_hz, 4),
+        "wall_seconds": round(elapsed, 4),
+        "steps_per_sec": round(steps / elapsed, 1) if elapsed > 0 else None,
+        "cleared": game.is_cleared,
+        "player": [game.player.rect.x, game.player.rect.y, game.player.is_big],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ウィンドウなしで物理演算だけを回す")
+    parser.add_argument("--headless", action="store_true", help="（main.py から呼ぶ時の目印。指定しなくても良い）")
+    parser.add_argument("--stage", action="append", choices=list(MAP_CONFIG), help="回すステージ（複数指定可。省略時は全ステージ）")
+    parser.add_argument("--seconds", type=float, default=10.0, help="1ステージあたりのシミュレーション時間（秒）")
+    parser.add_argument("--replay", action="append", metavar="PATH", help="記録した入力ファイルを再生する（複数指定可）")
+    args = parser.parse_args(argv)
+
+    game = create_game()
+    if args.replay:
+        for path in args.replay:
+            print(json.dumps(replay(game, path)))
+        return 0
+    for stage_id in args.stage or list(MAP_CONFIG):
+        print(json.dumps(simulate(game, stage_id, args.seconds)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+import pygame
+
+
+class HudLayer:
+    """
+    HUD（キャンディ・鍵の数など）を1枚の透明Surfaceにまとめて持つ。
+    要素ごとに「監視する値」を登録しておき、どれかが変わった時だけ描き直す。
+    Surface は画面左上を原点とするので、各要素は画面座標のまま描けば良い。
+    """
+
+    def __init__(self, size):
+        self.rect = pygame.Rect((0, 0), size)
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.elements = []  # [(name, watch, draw), ...]
+        self.state = None
+        self.dirty = True
+
+    def register(self, name, watch, draw):
+        """
+        watch(): 描き直しのきっかけになる値を返す関数（前回と != なら描き直し）
+        draw(surface): HUD 用Surfaceへ要素を描く関数
+        """
+        self.elements.append((name, watch, draw))
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def update(self):
+        """監視値を確認し、変化があれば描き直す。描き直した場合は True を返す"""
+        state = tuple(watch() for _, watch, _ in self.elements)
+        if not self.dirty and state == self.state:
+            return False
+
+        self.surface.fill((0, 0, 0, 0))
+        for _, _, draw in self.elements:
+            draw(self.surface)
+        self.state = state
+        self.dirty = False
+        return True
+
+    def draw(self, target):
+        self.update()
+        target.blit(self.surface, self.rect)
@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+MAX_LERP_DISTANCE = 64  # これ以上一気に動いた物（リスポーン・ワープ等）は補間せずそのまま描く
+
+
+class RenderInterpolator:
+    """
+    固定ステップの物理演算と描画のあいだを埋める補間。
+    各ステップの直前に rect を控えておき、描画時だけ「前回 → 今回」を alpha で線形補間した位置へ一時的に動かす。
+    """
+
+    def __init__(self):
+        self.prev = {}  # id(obj) -> (obj, 前ステップの Rect)
+
+    def reset(self):
+        self.prev = {}
+
+    def snapshot(self, objs):
+        self.prev = {id(o): (o, o.rect.copy()) for o in objs}
+
+    @contextmanager
+    def apply(self, objs, alpha):
+        """with の中でだけ objs の rect を補間位置に置き、抜けたら元に戻す"""
+        moved = []
+        if self.prev and alpha < 1.0:
+            for o in objs:
+                entry = self.prev.get(id(o))
+                if entry is None or entry[0] is not o:
+                    continue
+                old, cur = entry[1], o.rect
+                # 大きさが変わった（変身した）・大きく飛んだ場合は補間しない
+                if old.size != cur.size:
+                    continue
+                dx, dy = cur.x - old.x, cur.y - old.y
+                if (dx == 0 and dy == 0) or abs(dx) > MAX_LERP_DISTANCE or abs(dy) > MAX_LERP_DISTANCE:
+                    continue
+                moved.append((o, cur.topleft))
+                cur.topleft = (round(old.x + dx * alpha), round(old.y + dy * alpha))
+        try:
+            yield
+        finally:
+            for o, topleft in moved:
+                o.rect.topleft = topleft
@@ -1,22 +1,40 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
+if "--headless" in sys.argv[1:] or "--replay" in sys.argv[1:]:
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"  # 標準出力は結果の JSON だけにする（pygame の起動メッセージを出さない）
 import pygame
 import asyncio
-import sys
 import csv
 import json
-import os
 import base64
 import hashlib
 import platform
 import math
+import time
 from settings import *
 from player import Player
 from tiles import MapManager
+from effects import ClearEffect
+from hud import HudLayer
+from render_cache import SurfaceCache, TextCache
+from virtual_keys import VirtualKeyLayout
+from viewport import Viewport
+from dirty_rects import DirtyRegions
+from frame_pacer import FramePacer, IS_WEB
+from profiler import FrameProfiler
+from interpolation import RenderInterpolator
+from replay import InputRecorder
 ### debug用
 import subprocess # subprocessを使うのが最も軽量で安定します
 IS_RELEASE = getattr(sys, 'frozen', False)
 DEBUG_MODE = not IS_RELEASE
 ###
+PAUSE_SLIDER_RECT = pygame.Rect(150, 280, 380, 150) # 設定画面でスライダーを描き直す範囲
+HUD_HEIGHT = 72          # HUD レイヤーの高さ（画面上端から）
+TEXT_CACHE_SIZE = 256    # 描画済み文字列の保持上限
+SELECT_BADGE_LEVELS = 16 # セレクト画面の CLEAR 表示のパルスを何段階で描いておくか
+
 # セーブファイル用の秘密鍵
 SECRET_SALT = "my_super_secret_key_123"
 
@@ -79,6 +97,13 @@ class Game:
         except Exception as e:
             print(f"エディタ起動失敗: {e}")
 
+    def toggle_profiler(self):
+        """処理時間のオーバーレイ（F10）の表示を切り替える"""
+        if not DEBUG_MODE:
+            return
+        self._prof = self.profiler if self.profiler.toggle() else None
+        self.dirty_regions.invalidate()  # オーバーレイは実画面に直接描くので、消す時は全体を描き直す
+
     def debug_unlock_all_stages(self):
         """全てのチャプターとステージをクリア済みに設定する（既存スコアは維持）"""
         if not DEBUG_MODE:
@@ -101,20 +126,32 @@ class Game:
         
         # 辞書を更新し、セーブを実行
         self.cleared_stages = new_cleared_dict
+        self.progress_version += 1
         self.save_game() 
         print(f"DEBUG: 全 {len(self.cleared_stages)} ステージの開放を完了しました。")
     ###
 
-    def __init__(self):
-        pygame.mixer.pre_init(44100, -16, 1, 512) # 周波数を 44100Hz に固定
+    def __init__(self, headless=False):
+        # headless: ウィンドウも音も出さず（SDL のダミードライバ）、画像・音声のデコードもしない。
+        # 物理演算だけを最速で回すバッチ実行・ベンチマーク用（headless.py を参照）
+        self.headless = headless
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+        else:
+            pygame.mixer.pre_init(44100, -16, 1, 512) # 周波数を 44100Hz に固定
         pygame.init()
 
         # --- フォント読み込み ---
         font_path = resource_path("Fonts/NotoSansJP-Regular.otf")  # フォントファイル名を直接指定
         font_size = 28
         
+        if headless:
+            # 文字は描かないので、システムフォントの検索もしない
+            self.font_s = pygame.font.Font(None, font_size)
+            self.font_l = pygame.font.Font(None, 48)
         # 1. まずカレントディレクトリのファイルを試す
-        if os.path.exists(font_path):
+        elif os.path.exists(font_path):
             self.font_s = pygame.font.Font(font_path, font_size)
             self.font_l = pygame.font.SysFont(font_path, 48, bold=True)
             print("a")
@@ -132,24 +169,61 @@ class Game:
         # 2. 描画用のキャンバス（ここにすべてのゲーム画面を描く）
         self.game_canvas = pygame.Surface((self.BASE_WIDTH, self.BASE_HEIGHT))
         # 実際のウィンドウ（ブラウザやスマホの画面に合わせて変動）
-        self.screen = pygame.display.set_mode((self.BASE_WIDTH, self.BASE_HEIGHT), pygame.RESIZABLE)
+        # ヘッドレス（ダミードライバ）には同期する画面がないので vsync は指定しない
+        vsync = VSYNC and not IS_WEB and not headless
+        if vsync:
+            try:
+                self.screen = pygame.display.set_mode((self.BASE_WIDTH, self.BASE_HEIGHT), pygame.RESIZABLE, vsync=1)
+            except pygame.error:
+                # 垂直同期が使えない環境では通常のウィンドウにする
+                vsync = False
+        if not vsync:
+            self.screen = pygame.display.set_mode((self.BASE_WIDTH, self.BASE_HEIGHT), pygame.RESIZABLE)
+        # フレーム間隔の制御（目標FPS・待機画面での間引き）
+        self.frame_pacer = FramePacer(FPS, IDLE_FPS, vsync=vsync)
+        self.last_activity = 0.0  # 最後に入力があった時刻（待機画面の間引き判定用）
+        # 区間ごとの処理時間のオーバーレイ（F10）。無効の間は _prof が None で、計測は一切しない
+        self.profiler = FrameProfiler()
+        self._prof = None
+        # キャンバス→実画面の拡縮（ウィンドウサイズが変わった時だけ計算し直す）
+        self.viewport = Viewport((self.BASE_WIDTH, self.BASE_HEIGHT), SCALE_MODE)
+        # 差分描画（DIRTY_RECT_UPDATES が有効な時、前フレームから変わった範囲だけを描き直す）
+        self.dirty_regions = DirtyRegions()
 
         self.map_mgr = MapManager()
         from player import Player
         self.player = Player(0, 0)
-        self.load_assets()
-        pygame.display.set_caption("Spiki & Speaki")
-        # ウィンドウアイコンの設定
-        try:
-            # アイコン用の画像（こちらは .png でOK）を読み込む
-            icon_img = self.images.get(f"common_candy")
-            pygame.display.set_icon(icon_img)
-        except Exception as e:
-            print(f"Icon load error: {e}")
+
+        # 固定ステップの物理演算（余った時間は次のフレームへ持ち越し、描画は前後のステップを補間する）
+        self.sim_hz = WEB_SIM_HZ if IS_WEB else SIM_HZ
+        self.sim_accumulator = 0.0
+        self.render_alpha = 1.0
+        self.interpolator = RenderInterpolator()
+        self._pending_trigger = self._create_empty_input_state()["trigger"]
+
+        # 入力の記録（record_dir を指定すると、ステージを読み込むたびに1ファイルずつ記録する）
+        self.record_dir = None
+        self.recorder = None
+        self._record_count = 0
+        if headless:
+            self.images = {}
+        else:
+            self.load_assets()
+            pygame.display.set_caption("Spiki & Speaki")
+            # ウィンドウアイコンの設定
+            try:
+                # アイコン用の画像（こちらは .png でOK）を読み込む
+                icon_img = self.images.get(f"common_candy")
+                pygame.display.set_icon(icon_img)
+            except Exception as e:
+                print(f"Icon load error: {e}")
         self.clock = pygame.time.Clock()
         
         self.cleared_stages = set()  # クリアしたステージIDを保存する
-        self.load_game()  # 起動時にロードを実行
+        if headless:
+            self.cleared_stages = {}  # セーブデータは読み書きしない
+        else:
+            self.load_game()  # 起動時にロードを実行
 
         self.scene = "SELECT"
         self.focus_target = "STAGE"  # 初期状態はステージ選択
@@ -164,23 +238,50 @@ class Game:
         self.current_stage = 1
 
         # 音声設定
-        self.load_sounds()
-        self.play_bgm()
-        pygame.mixer.set_num_channels(16)
+        if headless:
+            self.sounds = {}
+        else:
+            self.load_sounds()
+            self.play_bgm()
+            pygame.mixer.set_num_channels(16)
         self.audio_initialized = False
 
         self.vol_bgm = 0.4 # BGM音量管理 (0.0 ～ 1.0)
         self.vol_se = 0.4 # SE音量管理 (0.0 ～ 1.0)
         self.slider_dragging = None # "BGM" か "SE" か
+
+        # 設定画面の描画キャッシュ
+        self._pause_backdrop = None  # ポーズ開始時のゲーム画面＋暗幕・タイトル・クレジット
+        self._pause_overlay = None
+        self._pause_credits = {}
+        self._pause_slider_layer = pygame.Surface(PAUSE_SLIDER_RECT.size, pygame.SRCALPHA)
+        self._pause_slider_key = None
         self.apply_volume() # 初期音量を適用
 
-        self.btn_font = pygame.font.SysFont("Arial", 24, bold=True)
+        self.btn_font = pygame.font.Font(None, 24) if headless else pygame.font.SysFont("Arial", 24, bold=True)
+        # 全 draw_* で共有する文字描画キャッシュ（毎フレームの font.render を避ける）
+        self.text_cache = TextCache(TEXT_CACHE_SIZE)
+
+        # HUD は値が変わった時だけ描き直す（新しい要素もここに登録する）
+        self.hud = HudLayer((SCREEN_WIDTH, HUD_HEIGHT))
+        self.hud.register("candy", lambda: self.candy_count, self.draw_candy_ui)
+        self.hud.register("keys", lambda: self.map_mgr.has_keys, self.draw_key_ui)
+        self.clear_effect = ClearEffect(self.font_l)
+
+        # セレクト画面の描画キャッシュ（状態が変わった時だけ作り直す）
+        self._select_menu_key = None
+        self.progress_version = 0  # cleared_stages を書き換えたら増やす（セレクト画面の作り直し判定用）
+        self._select_menu_layer = None
+        self._select_menu_badges = []
+        self._select_badge_cache = SurfaceCache(SELECT_BADGE_LEVELS * 2 + 2)
 
         # チュートリアル表示
         self.tutorial_alpha = 150.0      # 現在の透明度
         self.tutorial_target_alpha = 150.0 # 目標の透明度
         self.last_input_time = 0         # 最後に操作した時間 (ミリ秒)
         self.idle_delay = 500           # 操作を止めてから戻り始めるまでの時間 (2秒)
+        self._tutorial_frame = None      # 合成済みのチュートリアル表示
+        self._tutorial_frame_alpha = None # ↑を合成した時の透明度
 
 
         # StageLoad関係
@@ -194,16 +295,8 @@ class Game:
         self.player.vel_y = 0
         self.player.on_ground = True
 
-        # 仮想キー位置初期化
-        self.btn_left = pygame.Rect(0, 0, 0, 0)
-        self.btn_right = pygame.Rect(0, 0, 0, 0)
-        self.btn_up = pygame.Rect(0, 0, 0, 0)
-        self.btn_down = pygame.Rect(0, 0, 0, 0)
-        self.btn_jump = pygame.Rect(0, 0, 0, 0)
-        self.btn_change = pygame.Rect(0, 0, 0, 0)
-        self.btn_reload = pygame.Rect(0, 0, 0, 0)
-        self.btn_menu = pygame.Rect(0, 0, 0, 0)
-        self.btn_esc = pygame.Rect(0, 0, 0, 0)
+        # 仮想キー（配置とスキンはウィンドウサイズが決まった時に作る）
+        self.key_layout = VirtualKeyLayout(self.btn_font, self.text_cache)
 
 
     # #######################################################################################
@@ -234,7 +327,8 @@ class Game:
 
     def apply_volume(self):
         # BGMの音量を適用
-        pygame.mixer.music.set_volume(self.vol_bgm)
+        if pygame.mixer.get_init():
+            pygame.mixer.music.set_volume(self.vol_bgm)
         # 全SEの音量を適用
         for s in self.sounds.values():
             s.set_volume(self.vol_se)
@@ -309,6 +403,12 @@ class Game:
                         if short_name not in self.images:
                             self.images[short_name] = img
 
+        # L/R ブロック用の半透明版を作っておく（描画のたびに共有画像の set_alpha を書き換えない）
+        for key in [k for k in self.images if k.endswith(("toggle_large", "toggle_small"))]:
+            faded = self.images[key].copy()
+            faded.fill((255, 255, 255, 80), special_flags=pygame.BLEND_RGBA_MULT)
+            self.images[f"{key}_faded"] = faded
+
     def load_stage(self, stage_id):
         # 1. 設定の取得（安全に取得するために .get() を推奨）
         config = MAP_CONFIG.get(stage_id)
@@ -329,7 +429,13 @@ class Game:
         self.is_cleared = False
 
         # 4. マップオブジェクトの生成
-        self.map_mgr.create_map(map_list)
+        self.map_mgr.create_map(map_list, self.current_chapter, self.images)
+        if not self.headless:
+            self._bake_static_layer(stage_id)
+        self._reset_simulation()
+        self._start_recording(stage_id)
+        if not self.headless:
+            self._build_tutorial_overlay()
 
         # 5. プレイヤーの開始位置決定
         if self.map_mgr.player_start_pos != (0, 0):
@@ -349,7 +455,69 @@ class Game:
         self.player.vel_y = 0      # 落下速度リセット
         self.player.on_ground = True # 接地状態から開始
 
+    def _bake_static_layer(self, stage_id):
+        """
+        背景と動かないタイル(draw_tiles)を1枚のSurfaceにまとめて描いておく。
+        L/R ブロックは押せるブロック等より上に描く（重なった時の見え方を変えない）ため、ここには含めない。
+        """
+        # 同じステージのリトライ(R)では作り直さない
+        if getattr(self, "static_layer_id", None) == stage_id:
+            return
+
+        chapter = self.current_chapter
+        base = pygame.Surface((self.BASE_WIDTH, self.BASE_HEIGHT)).convert()
+
+        bg_img = self.images.get(f"{chapter}_bg", self.images.get("common_bg"))
+        if bg_img:
+            base.blit(bg_img, (0, 0))
+        else:
+            base.fill((50, 50, 80))
+
+        base.fblits([(item["img"], item["blit_pos"]) for item in self.map_mgr.draw_tiles if item["img"]])
+        self.static_layer = base
+        self.static_layer_id = stage_id
+
+    def _build_tutorial_overlay(self):
+        """チュートリアルの枠と文字を不透明な状態で一度だけ描いておく（透明度は描画時に掛ける）"""
+        self._tutorial_frame = None
+        self._tutorial_frame_alpha = None
+        if not self.current_tutorial:
+            return
+
+        rect_width = 620
+        line_spacing = 10
+        padding = 20
+        h = (padding * 2) + (len(self.current_tutorial) * (20 + line_spacing))
+        self._tutorial_pos = ((800 - rect_width) // 2, 100)
+
+        panel = pygame.Surface((rect_width, h), pygame.SRCALPHA)
+        panel.fill((20, 20, 20, 255))
+        pygame.draw.rect(panel, (200, 200, 150, 255), (0, 0, rect_width, h), 2)
+        self._tutorial_panel = panel
+
+        text = pygame.Surface((rect_width, h), pygame.SRCALPHA)
+        for i, line in enumerate(self.current_tutorial):
+            txt = self.text_cache.render(self.font_s, line, True, (255, 215, 0))
+            text.blit(txt, (padding, padding + i * (20 + line_spacing)))
+        self._tutorial_text = text
+
+    def _compose_tutorial_frame(self, alpha):
+        """
+        枠(alpha)と文字(alpha+50)を乗算済みアルファで1枚に合成する。
+        BLEND_PREMULTIPLIED で貼ると、枠・文字を順に直接貼った場合と同じ結果になる。
+        """
+        panel = self._tutorial_panel.copy()
+        panel.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+        text = self._tutorial_text.copy()
+        text.fill((255, 255, 255, min(255, alpha + 50)), special_flags=pygame.BLEND_RGBA_MULT)
+
+        frame = panel.premul_alpha()
+        frame.blit(text.premul_alpha(), (0, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
+        return frame
+
     def save_game(self):
+        if self.headless:
+            return  # ヘッドレス実行ではセーブデータを書き換えない
         try:
             # 1. cleared_stagesは既に辞書なので、そのまま保存
             save_dict = {
@@ -463,6 +631,8 @@ class Game:
         """物理演算・ギミック更新（inputsを受け取る形に完全統合）"""
         if self.scene == "SELECT" or self.is_paused or self.is_cleared:
             return
+        prof = self._prof
+        if prof: prof.lap("sim")
         
         # 1. 入力の統合（キーボード/スマホの区別をここで吸収）
         # custom_keys は Player.update が期待する形式に合わせる
@@ -474,24 +644,22 @@ class Game:
         
         old_top = self.player.rect.top
 
-        # --- 衝突対象の動的生成 ---
-        active_toggle_tiles = self.map_mgr.large_only_tiles if self.player.is_big else self.map_mgr.small_only_tiles
+        # --- 衝突対象（永続的な衝突ワールドから近傍だけを取り出す） ---
+        # 大きさ・鍵の所持状況に応じて有効レイヤーを切り替える（変化した時だけ再計算）
+        world = self.map_mgr.world
+        world.set_flags(self.player.is_big, self.map_mgr.has_keys == 0)
         
-        # ドア（鍵がない間は壁）
-        player_door_obstacles = []
-        if self.map_mgr.has_keys == 0:
-            player_door_obstacles = [{'rect': d['rect']} for d in self.map_mgr.doors]
-        
-        collision_targets = (self.map_mgr.tiles + self.map_mgr.bricks + 
-                             player_door_obstacles + active_toggle_tiles)
+        area = self.player.sweep_area(dt)
+        collision_targets = world.query_player(area)
 
         # 動くブロックを床として追加
-        for pb in self.map_mgr.pushable_blocks:
-            if self.player.rect.bottom <= pb.rect.top + 5:
-                collision_targets.append({'rect': pb.rect})
+        for entry in world.block_entries:
+            if self.player.rect.bottom <= entry['rect'].top + 5:
+                collision_targets.append(entry)
                 
         # 2. プレイヤー物理更新
-        self.player.update(custom_keys, collision_targets, self.map_mgr.platforms, dt)
+        self.player.update(custom_keys, collision_targets, world.query(area, "platforms"), dt)
+        if prof: prof.lap("player")
 
         # 3. 頭突き判定 (triggerではなく現在の速度と位置で判定)
         if self.player.vel_y <= 0 and not self.player.on_ground:
@@ -499,9 +667,11 @@ class Game:
 
         # 4. ギミック更新 (鍵・ドア)
         self._update_gizmos(dt)
+        if prof: prof.lap("gizmos")
 
         # 5. 押せるブロックの更新
-        self._update_pushable_blocks(active_toggle_tiles, dt)
+        self._update_pushable_blocks(dt)
+        if prof: prof.lap("blocks")
 
         # 6. 状態判定 (落下・ゴール)
         self._check_game_status()
@@ -522,7 +692,7 @@ class Game:
             for d_data in self.map_mgr.doors[:]:
                 # d_data も辞書なので、['rect'] を指定
                 if self.player.rect.colliderect(d_data['rect']):
-                    self.map_mgr.doors.remove(d_data)
+                    self.map_mgr.remove_door(d_data)
                     self.map_mgr.has_keys -= 1
                     if 'door_open' in self.sounds: self.sounds['door_open'].play()
 
@@ -543,8 +713,10 @@ class Game:
                            current_count < self.cleared_stages[self.current_stage_id]:
                             
                             self.cleared_stages[self.current_stage_id] = current_count
+                            self.progress_version += 1
                             self.save_game()  # 更新があった時のみセーブ
-                            print(f"New Record!: {self.current_stage_id} - {current_count} times")
+                            if not self.headless:  # ヘッドレスではセーブしない（標準出力は結果の JSON だけにする）
+                                print(f"New Record!: {self.current_stage_id} - {current_count} times")
                         else:
                             # 記録更新はしなくても、クリア済みフラグ維持のためにセーブが必要ならここに追加
                             self.save_game()
@@ -554,7 +726,7 @@ class Game:
                     self.player.is_big = False
                     self.player.rect.height = 64
                     self.player.rect.bottom = g.bottom # 地面に合わせる
-                    self.sounds['clear'].play() # クリア音
+                    if 'clear' in self.sounds: self.sounds['clear'].play() # クリア音
 
     def _handle_headbutt(self, old_top):
         """頭突きロジックの集約"""
@@ -563,14 +735,14 @@ class Game:
         check_rect.top = self.player.rect.top - 5
 
         # レンガ
-        for b in self.map_mgr.bricks[:]:
+        for b in self.map_mgr.query(check_rect, "bricks"):
             if check_rect.colliderect(b['rect']):
                 if self.player.rect.top < b['rect'].bottom + 10:
                     if self.player.is_big:
-                        self.sounds['break'].play()
-                        self.map_mgr.bricks.remove(b)
+                        if 'break' in self.sounds: self.sounds['break'].play()
+                        self.map_mgr.remove_brick(b)
                     else:
-                        self.sounds['hit'].play()
+                        if 'hit' in self.sounds: self.sounds['hit'].play()
                     self._rebound_player(b['rect'].bottom)
                     return
     
@@ -580,15 +752,10 @@ class Game:
         self.player.vel_y = 3.0 
         self.player.air_timer = 10
 
-    def _update_pushable_blocks(self, active_toggle_tiles, dt):
+    def _update_pushable_blocks(self, dt):
         """ブロックの物理と押し出し"""
-        block_door_obstacles = [{'rect': d['rect']} for d in self.map_mgr.doors]
-
-        for i, pb in enumerate(self.map_mgr.pushable_blocks):
-            other_blocks = [{'rect': ob.rect} for j, ob in enumerate(self.map_mgr.pushable_blocks) if i != j]
-            obstacles = (self.map_mgr.tiles + self.map_mgr.bricks + 
-                         block_door_obstacles + other_blocks + active_toggle_tiles)
-            
+        world = self.map_mgr.world
+        for pb, own_entry in zip(self.map_mgr.pushable_blocks, world.block_entries):
             #1. プレイヤーによる押し出し判定（先に速度を決める）
             if self.player.rect.colliderect(pb.rect):
                 if self.player.is_big:
@@ -605,12 +772,39 @@ class Game:
                 self.player.pos_x = float(self.player.rect.x - 4)
 
             # 2. ブロック自身の物理更新（ここで vel_x に基づいて実際に動く）
-            pb.update(obstacles, self.map_mgr.platforms, dt)
+            # 押し出しで vel_x が決まった後に候補範囲を求める
+            area = pb.sweep_area(dt)
+            obstacles = world.query_block(area)
+            # 他のブロック（ラップ済みのエントリをそのまま使う）
+            obstacles.extend(e for e in world.block_entries if e is not own_entry)
+            pb.update(obstacles, world.query(area, "platforms"), dt)
 
     # #######################################################################################
     # DRAW
     # #######################################################################################
     def draw_select_menu(self):
+        """
+        セレクト画面は入力や進捗が変わった時だけ作り直した1枚を貼る。
+        CLEAR 表示だけはパルスするので、量子化済みのフレームを重ねる。
+        """
+        state_key = (self.current_chapter_idx, self.select_stage_idx, self.focus_target, self.progress_version)
+        if state_key != self._select_menu_key:
+            self._select_menu_layer, self._select_menu_badges = self._build_select_menu_layer()
+            self._select_menu_key = state_key
+
+        self.game_canvas.blit(self._select_menu_layer, (0, 0))
+
+        pulse = (math.sin(pygame.time.get_ticks() / 200) + 1) / 2
+        level = round(pulse * SELECT_BADGE_LEVELS)
+        for text_str, anchor in self._select_menu_badges:
+            badge, origin = self._select_badge_frame(text_str, level)
+            self.game_canvas.blit(badge, (anchor[0] - origin[0], anchor[1] - origin[1]))
+
+    def _build_select_menu_layer(self):
+        """セレクト画面の静的な部分（背景・タブ・ステージアイコン）を1枚に描く"""
+        surf = pygame.Surface((self.BASE_WIDTH, self.BASE_HEIGHT)).convert()
+        badges = [] # [(表示文字列, 基準点), ...]
+
         # --- 背景描画 ---
         # 現在のチャプター名を取得 (例: "grassland", "forest" ...)
         current_chap_name = self.chapters[self.current_chapter_idx]
@@ -625,7 +819,7 @@ class Game:
 
         if bg_img:
             # 画面サイズにフィットさせて描画
-            self.game_canvas.blit(bg_img, (0, 0))
+            surf.blit(bg_img, (0, 0))
         else:
             # 画像が一切ない場合のフォールバック（チャプターごとのイメージカラー）
             fallback_colors = {
@@ -634,11 +828,11 @@ class Game:
                 "cave": (50, 40, 30),      # 茶
             }
             bg_color = fallback_colors.get(current_chap_name, (50, 50, 80))
-            self.game_canvas.fill(bg_color)
+            surf.fill(bg_color)
 
         overlay = pygame.Surface((800, 600), pygame.SRCALPHA)
         overlay.fill((0, 0, 0, 40))
-        self.game_canvas.blit(overlay, (0, 0))
+        surf.blit(overlay, (0, 0))
         
         # --- タブ（チャプター）の描画 ---
         tab_x, tab_y = 100, 130
@@ -656,7 +850,7 @@ class Game:
                     glow_color = (255, 255, 0, glow_alpha)
                     s = pygame.Surface(glow_rect.size, pygame.SRCALPHA)
                     pygame.draw.rect(s, glow_color, s.get_rect(), width=2, border_radius=10+r)
-                    self.game_canvas.blit(s, glow_rect.topleft)
+                    surf.blit(s, glow_rect.topleft)
 
             # --- 2. 半透明パネルの設定 ---
             tab_panel = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
@@ -677,28 +871,27 @@ class Game:
             # --- 3. パネル本体の描画 ---
             pygame.draw.rect(tab_panel, bg_color, tab_panel.get_rect(), border_radius=10)
             pygame.draw.rect(tab_panel, border_color, tab_panel.get_rect(), 2, border_radius=10)
-            self.game_canvas.blit(tab_panel, rect)
+            surf.blit(tab_panel, rect)
 
             # --- 4. チャプター名の描画 ---
             name_color = (255, 255, 255) if is_chap_unlocked else (150, 150, 150)
-            txt = self.font_s.render(name.upper(), True, name_color)
+            txt = self.text_cache.render(self.font_s, name.upper(), True, name_color)
             txt_rect = txt.get_rect(center=rect.center)
             
             # テキストシャドウ
-            txt_shadow = self.font_s.render(name.upper(), True, (0, 0, 0))
-            txt_shadow.set_alpha(100)
-            self.game_canvas.blit(txt_shadow, (txt_rect.x + 2, txt_rect.y + 2))
-            self.game_canvas.blit(txt, txt_rect)
+            txt_shadow = self.text_cache.render(self.font_s, name.upper(), True, (0, 0, 0), alpha=100)
+            surf.blit(txt_shadow, (txt_rect.x + 2, txt_rect.y + 2))
+            surf.blit(txt, txt_rect)
 
             # --- 5. ロック演出 ---
             if not is_chap_unlocked:
-                lock_base = self.font_s.render("LOCK", True, (255, 255, 255))
+                lock_base = self.text_cache.render(self.font_s, "LOCK", True, (255, 255, 255))
                 lock_rot = pygame.transform.rotate(lock_base, 20) # タブは細いので20度くらい
                 l_rect = lock_rot.get_rect(center=rect.center)
                 
-                l_shadow = pygame.transform.rotate(self.font_s.render("LOCK", True, (0, 0, 0)), 20)
-                self.game_canvas.blit(l_shadow, (l_rect.x + 1, l_rect.y + 1))
-                self.game_canvas.blit(lock_rot, l_rect)
+                l_shadow = pygame.transform.rotate(self.text_cache.render(self.font_s, "LOCK", True, (0, 0, 0)), 20)
+                surf.blit(l_shadow, (l_rect.x + 1, l_rect.y + 1))
+                surf.blit(lock_rot, l_rect)
 
         # --- ステージアイコン(01-10)の描画 ---
         start_x, start_y = 100, 220
@@ -731,7 +924,7 @@ class Game:
                     glow_color = (255, 255, 0, glow_alpha)
                     s = pygame.Surface(glow_rect.size, pygame.SRCALPHA)
                     pygame.draw.rect(s, glow_color, s.get_rect(), width=2, border_radius=15+r)
-                    self.game_canvas.blit(s, glow_rect.topleft)
+                    surf.blit(s, glow_rect.topleft)
             else:
                 # 開放済み：明るい白（半透明）
                 bg_color = (255, 255, 255, 120)
@@ -745,7 +938,7 @@ class Game:
             pygame.draw.rect(panel_surf, border_color, panel_rect, 2, border_radius=15)
             
             # パネルをメインキャンバスに合成
-            self.game_canvas.blit(panel_surf, rect)
+            surf.blit(panel_surf, rect)
 
             # --- 4. 文字描画 ---
             num_str = f"{i+1:02}"
@@ -753,111 +946,132 @@ class Game:
             num_color = (255, 255, 255) if unlocked else (180, 180, 180)
             
             # シャドウ（透明感を引き立てるために少し薄く）
-            num_shadow = self.font_l.render(num_str, True, (0, 0, 0))
-            num_shadow.set_alpha(150)
-            self.game_canvas.blit(num_shadow, (rect.centerx - num_shadow.get_width()//2 + 2, rect.centery - num_shadow.get_height()//2 + 2))
+            num_shadow = self.text_cache.render(self.font_l, num_str, True, (0, 0, 0), alpha=150)
+            surf.blit(num_shadow, (rect.centerx - num_shadow.get_width()//2 + 2, rect.centery - num_shadow.get_height()//2 + 2))
             
             # 本体
-            num_txt = self.font_l.render(num_str, True, num_color)
-            self.game_canvas.blit(num_txt, (rect.centerx - num_txt.get_width()//2, rect.centery - num_txt.get_height()//2))
+            num_txt = self.text_cache.render(self.font_l, num_str, True, num_color)
+            surf.blit(num_txt, (rect.centerx - num_txt.get_width()//2, rect.centery - num_txt.get_height()//2))
 
             # --- 5. ロック演出 ---
             if not unlocked:
                 # LOCK文字を斜めに。白を強調。
-                lock_base = self.font_s.render("LOCK", True, (255, 255, 255))
+                lock_base = self.text_cache.render(self.font_s, "LOCK", True, (255, 255, 255))
                 lock_rot = pygame.transform.rotate(lock_base, 30)
                 lock_rect = lock_rot.get_rect(center=rect.center)
                 
                 # 下に黒い影を置いて視認性確保
-                lock_shadow = pygame.transform.rotate(self.font_s.render("LOCK", True, (0, 0, 0)), 30)
-                self.game_canvas.blit(lock_shadow, (lock_rect.x + 2, lock_rect.y + 2))
-                self.game_canvas.blit(lock_rot, lock_rect)
+                lock_shadow = pygame.transform.rotate(self.text_cache.render(self.font_s, "LOCK", True, (0, 0, 0)), 30)
+                surf.blit(lock_shadow, (lock_rect.x + 2, lock_rect.y + 2))
+                surf.blit(lock_rot, lock_rect)
             
-            # --- 6. CLEAR表示（条件分岐演出） ---
+            # --- 6. CLEAR表示（パルス演出は毎フレーム重ねるので、ここでは位置だけ記録） ---
             if unlocked:
                 stage_id = f"{self.chapters[self.current_chapter_idx]}_{i+1:02}"
                 if stage_id in self.cleared_stages:
-                    import math
                     best_count = self.cleared_stages.get(stage_id, 999)
                     target_count = MAP_CONFIG.get(stage_id, {}).get("target_changes", 0)
                     
+                    # 条件によって「テキスト」を決定
                     is_perfect = best_count <= target_count
-                    pulse = (math.sin(pygame.time.get_ticks() / 200) + 1) / 2
-
-                    # 1. 条件によって「テキスト」と「色」を決定
-                    if is_perfect:
-                        text_str = "CLEAR!"
-                        glow_base_color = (100, 255, 100) # 鮮やかな緑
-                        text_color = (int(100 + 155 * pulse), 255, int(100 + 155 * pulse))
-                    else:
-                        text_str = "CLEAR"
-                        glow_base_color = (100, 255, 100) # 通常クリアも緑で光らせる
-                        text_color = (int(100 + 155 * pulse), 255, int(100 + 155 * pulse))
-
-                    # 2. 背後の後光（共通演出）
-                    glow_size = int(5 + pulse * 5)
-                    for r in range(1, glow_size):
-                        alpha = int((80 - r * 10) * pulse)
-                        if alpha <= 0: break
-                        
-                        glow_color = (*glow_base_color, alpha)
-                        temp_rect = pygame.Rect(0, 0, 70 + r*2, 20 + r*2)
-                        temp_rect.center = (rect.centerx, rect.bottom + 18)
-                        
-                        s = pygame.Surface(temp_rect.size, pygame.SRCALPHA)
-                        pygame.draw.ellipse(s, glow_color, s.get_rect())
-                        self.game_canvas.blit(s, temp_rect.topleft)
-
-                    # 3. テキスト描画
-                    check_txt = self.font_s.render(text_str, True, text_color)
-                    check_rect = check_txt.get_rect(centerx=rect.centerx, top=rect.bottom + 5)
-                    
-                    # シャドウ
-                    check_shadow = self.font_s.render(text_str, True, (0, 0, 0))
-                    self.game_canvas.blit(check_shadow, (check_rect.x + 1, check_rect.y + 1))
-                    self.game_canvas.blit(check_txt, check_rect)
+                    text_str = "CLEAR!" if is_perfect else "CLEAR"
+                    badges.append((text_str, (rect.centerx, rect.bottom)))
+
+        return surf, badges
+
+    def _select_badge_frame(self, text_str, level):
+        """CLEAR 表示（後光＋テキスト）をパルスの段階ごとに一度だけ描いておく"""
+        key = (text_str, level)
+        frame = self._select_badge_cache.get(key)
+        if frame is not None:
+            return frame
+
+        pulse = level / SELECT_BADGE_LEVELS
+        glow_base_color = (100, 255, 100) # 通常クリアも緑で光らせる
+        text_color = (int(100 + 155 * pulse), 255, int(100 + 155 * pulse))
+
+        check_txt = self.text_cache.render(self.font_s, text_str, True, text_color)
+        check_shadow = self.text_cache.render(self.font_s, text_str, True, (0, 0, 0))
+        tw, th = check_txt.get_size()
+
+        # 基準点（アイコン下端の中心）を origin に置いた透明Surface
+        w = max(90, tw + 2) + 4
+        h = 2 + max(38, 5 + th + 1) + 2
+        origin = (w // 2, 2)
+        badge = pygame.Surface((w, h), pygame.SRCALPHA)
+
+        # 1. 背後の後光
+        glow_size = int(5 + pulse * 5)
+        for r in range(1, glow_size):
+            alpha = int((80 - r * 10) * pulse)
+            if alpha <= 0: break
+            temp_rect = pygame.Rect(0, 0, 70 + r*2, 20 + r*2)
+            temp_rect.center = (origin[0], origin[1] + 18)
+            s = pygame.Surface(temp_rect.size, pygame.SRCALPHA)
+            pygame.draw.ellipse(s, (*glow_base_color, alpha), s.get_rect())
+            badge.blit(s, temp_rect.topleft)
+
+        # 2. テキスト（シャドウ付き）
+        check_rect = check_txt.get_rect(centerx=origin[0], top=origin[1] + 5)
+        badge.blit(check_shadow, (check_rect.x + 1, check_rect.y + 1))
+        badge.blit(check_txt, check_rect)
+
+        frame = (badge, origin)
+        self._select_badge_cache.put(key, frame)
+        return frame
                     
-    def draw_candy_ui(self):
+    def draw_candy_ui(self, surface):
         candy_img = self.images.get("common_candy")
         if candy_img:
             # キャンディのサイズを調整（例: 32x32）
             candy_small = pygame.transform.scale(candy_img, (32, 32))
             for i in range(self.candy_count):
                 # 20px間隔で左上に並べる
-                self.game_canvas.blit(candy_small, (70 + i * 40, 20))
+                surface.blit(candy_small, (70 + i * 40, 20))
 
-    def draw_key_ui(self):
+    def draw_key_ui(self, surface):
         if self.map_mgr.has_keys:
             key_img = self.images.get("common_key", self.images.get("key"))
             if key_img:
                 # UI用に少し小さくリサイズ
                 small_key = pygame.transform.scale(key_img, (32, 32))
-                self.game_canvas.blit(small_key, (300, 20)) # キャンディUIの右あたり
+                surface.blit(small_key, (300, 20)) # キャンディUIの右あたり
                 
-                val_txt = self.font_s.render(f"x {self.map_mgr.has_keys}", True, (255, 255, 255))
-                self.game_canvas.blit(val_txt, (340, 22))
+                val_txt = self.text_cache.render(self.font_s, f"x {self.map_mgr.has_keys}", True, (255, 255, 255))
+                surface.blit(val_txt, (340, 22))
 
     def draw_pause_menu(self):
-        # 画面全体を暗くする
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.game_canvas.blit(overlay, (0, 0))
-
-        # --- 設定項目（既存） ---
-        title = self.font_l.render("SETTINGS", True, (255, 255, 255))
-        self.game_canvas.blit(title, (SCREEN_WIDTH//2 - 100, 150))
-
-        # スライダー描画ロジック（既存）
+        """
+        設定画面。ポーズ中はゲーム画面が止まっているので、暗幕・タイトル・クレジットは
+        ポーズ開始時にゲーム画面ごと1枚に焼き込み、スライダーだけ音量が変わった時に描き直す。
+        """
+        # スライダーの配置（当たり判定でも使う）
         self.slider_x = 300
         self.slider_y = 300
         self.slider_w = 200
-        labels = [("BGM", self.vol_bgm, self.slider_y), (" SE", self.vol_se, self.slider_y + 80)]
-        for label, vol, y in labels:
-            txt = self.font_s.render(f"{label}: {int(vol*100)}%", True, (255, 255, 255))
-            self.game_canvas.blit(txt, (self.slider_x - 130, y - 5))
-            pygame.draw.rect(self.game_canvas, (100, 100, 100), (self.slider_x, y+5, self.slider_w, 10), border_radius=5)
-            pygame.draw.rect(self.game_canvas, (0, 255, 100), (self.slider_x, y+5, int(self.slider_w * vol), 10), border_radius=5)
-            pygame.draw.circle(self.game_canvas, (255, 255, 255), (self.slider_x + int(self.slider_w * vol), y+10), 8)
+
+        if self._pause_backdrop is None:
+            self._draw_pause_static(self.game_canvas)
+            self._pause_backdrop = self.game_canvas.copy()
+        else:
+            self.game_canvas.blit(self._pause_backdrop, (0, 0))
+
+        slider_key = (self.vol_bgm, self.vol_se)
+        if slider_key != self._pause_slider_key:
+            self._draw_pause_sliders(self._pause_slider_layer)
+            self._pause_slider_key = slider_key
+        self.game_canvas.blit(self._pause_slider_layer, PAUSE_SLIDER_RECT)
+
+    def _draw_pause_static(self, surface):
+        # 画面全体を暗くする
+        if self._pause_overlay is None:
+            self._pause_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            self._pause_overlay.fill((0, 0, 0, 180))
+        surface.blit(self._pause_overlay, (0, 0))
+
+        # --- 設定項目（既存） ---
+        title = self.text_cache.render(self.font_l, "SETTINGS", True, (255, 255, 255))
+        surface.blit(title, (SCREEN_WIDTH//2 - 100, 150))
 
         # --- クレジット表示（画面下部） ---
         # 1. 表示内容の定義
@@ -870,189 +1084,192 @@ class Game:
         margin_bottom = 15
         
         for i, text in enumerate(reversed(credits)): # 下から順に描画
-            # 1. テキスト生成
-            raw_txt = self.font_s.render(text, True, (150, 150, 150))
-            
-            # 2. サイズを60%程度に縮小（font_sが大きすぎる場合の対策）
-            orig_w, orig_h = raw_txt.get_size()
-            scale = 0.6
-            credit_txt = pygame.transform.smoothscale(raw_txt, (int(orig_w * scale), int(orig_h * scale)))
-            
-            # 3. 透明度をさらに下げる（120/255）
-            credit_txt.set_alpha(180)
+            # 1. テキスト生成（縮小・半透明化済みのものを使い回す）
+            credit_txt = self._pause_credits.get(text)
+            if credit_txt is None:
+                raw_txt = self.text_cache.render(self.font_s, text, True, (150, 150, 150))
+                
+                # 2. サイズを60%程度に縮小（font_sが大きすぎる場合の対策）
+                orig_w, orig_h = raw_txt.get_size()
+                scale = 0.6
+                credit_txt = pygame.transform.smoothscale(raw_txt, (int(orig_w * scale), int(orig_h * scale)))
+                
+                # 3. 透明度をさらに下げる（120/255）
+                credit_txt.set_alpha(180)
+                self._pause_credits[text] = credit_txt
             
             # 4. 配置計算（右下基準）
             pos_x = SCREEN_WIDTH - credit_txt.get_width() - margin_right
             pos_y = SCREEN_HEIGHT - margin_bottom - (i * 15 + credit_txt.get_height())
             
             # 描画（シャドウなし。文字が小さいため、シャドウがあると逆に潰れて見えるため）
-            self.game_canvas.blit(credit_txt, (pos_x, pos_y))
+            surface.blit(credit_txt, (pos_x, pos_y))
+
+    def _draw_pause_sliders(self, layer):
+        """スライダー（ラベル・バー・つまみ）を PAUSE_SLIDER_RECT 基準の透明レイヤーに描く"""
+        layer.fill((0, 0, 0, 0))
+        ox, oy = PAUSE_SLIDER_RECT.topleft
+        x, w = self.slider_x - ox, self.slider_w
+        labels = [("BGM", self.vol_bgm, self.slider_y - oy), (" SE", self.vol_se, self.slider_y + 80 - oy)]
+        for label, vol, y in labels:
+            txt = self.text_cache.render(self.font_s, f"{label}: {int(vol*100)}%", True, (255, 255, 255))
+            layer.blit(txt, (x - 130, y - 5))
+            pygame.draw.rect(layer, (100, 100, 100), (x, y+5, w, 10), border_radius=5)
+            pygame.draw.rect(layer, (0, 255, 100), (x, y+5, int(w * vol), 10), border_radius=5)
+            pygame.draw.circle(layer, (255, 255, 255), (x + int(w * vol), y+10), 8)
 
     def draw_virtual_keys(self, surface, screen_w, screen_h):
-        # --- 1. サイズと余白の設定 ---
-        margin = 20
-        bw, bh = 90, 90    # 重なりを防ぐため、100から少しだけ絞り90pxに調整
-        sw, sh = 60, 60
-        gap = 15           # ボタン同士の隙間
-
-        # --- 2. ボタンの配置定義 ---
-        # 左側（移動）：重なりを防ぐため「下」を中央、「左」「右」をその両脇に配置（逆T字）
-        # ※画面の一番下に「下ボタン」を配置
-        self.btn_down  = pygame.Rect(margin + bw + gap, screen_h - bh - margin, bw, bh)
-        self.btn_left  = pygame.Rect(margin, screen_h - bh - margin, bw, bh)
-        self.btn_right = pygame.Rect(margin + (bw + gap) * 2, screen_h - bh - margin, bw, bh)
-        
-        # 「上」は必要なシーンでのみ使用（配置は左と右の間、一段上）
-        self.btn_up    = pygame.Rect(margin + bw + gap, screen_h - (bh * 2) - margin - gap, bw, bh)
+        # 配置とスキンはウィンドウサイズが変わった時だけ作り直される
+        self.key_layout.ensure((screen_w, screen_h))
 
-        # 右側（アクション）：Jumpを右端、Changeをその隣に配置（横並び）
-        self.btn_jump   = pygame.Rect(screen_w - bw - margin, screen_h - bh - margin, bw, bh)
-        self.btn_change = pygame.Rect(screen_w - (bw * 2) - margin - gap, screen_h - bh - margin, bw, bh)
-
-        # システム系（画面上部）
-        self.btn_menu   = pygame.Rect(margin, margin, sw, sh)
-        self.btn_esc    = pygame.Rect((screen_w - sw) / 2, margin, sw, sh)
-        self.btn_reload = pygame.Rect(screen_w - sw - margin, margin, sw, sh)
-
-        # --- 3. 表示ロジック ---
         if self.is_paused:
-            buttons = [(self.btn_esc, "ESC")]
+            buttons = [("esc", "ESC")]
         else:
             if self.scene == "SELECT":
                 buttons = [
-                    (self.btn_left, "←"), (self.btn_right, "→"),
-                    (self.btn_up, "↑"), (self.btn_down, "↓"),
-                    (self.btn_jump, "OK"), (self.btn_esc, "ESC")
+                    ("left", "←"), ("right", "→"),
+                    ("up", "↑"), ("down", "↓"),
+                    ("jump", "OK"), ("esc", "ESC")
                 ]
             elif self.scene == "PLAYING":
                 # プレイ中：↑は除外、移動は←↓→の並びに
                 jump_label = "OK" if self.is_cleared else "Jump"
                 buttons = [
-                    (self.btn_left, "←"), (self.btn_down, "↓"), (self.btn_right, "→"),
-                    (self.btn_jump, jump_label),
-                    (self.btn_reload, "R"), (self.btn_menu, "M"),
-                    (self.btn_esc, "ESC")
+                    ("left", "←"), ("down", "↓"), ("right", "→"),
+                    ("jump", jump_label),
+                    ("reload", "R"), ("menu", "M"),
+                    ("esc", "ESC")
                 ]
                 # クリアしていない時だけ「Change」ボタンをリストに加える
                 if not self.is_cleared:
-                    buttons.append((self.btn_change, "Spiki"))
+                    buttons.append(("change", "Spiki"))
             else:
                 return
 
-        # --- 4. 描画処理 ---
-        for btn, label in buttons:
-            s = pygame.Surface((btn.width, btn.height), pygame.SRCALPHA)
-            # 枠と背景の透明度を少し上げて、ゲーム画面を見やすく調整
-            pygame.draw.rect(s, (255, 255, 255, 40), s.get_rect(), border_radius=15)
-            
-            text_surf = self.btn_font.render(label, True, (255, 255, 255))
-            text_rect = text_surf.get_rect(center=(btn.width // 2, btn.height // 2))
-            s.blit(text_surf, text_rect)
-            
-            surface.blit(s, btn.topleft)
-            pygame.draw.rect(surface, (255, 255, 255, 80), btn, 2, border_radius=15)
-
-    def draw_play_scene(self, dt):
-        # chapterは 'grassland' や 'cave' が入る想定
-        chapter = self.current_chapter
-            
-        # 1. 背景描画
-        bg_key = f"{chapter}_bg"
-        bg_img = self.images.get(bg_key, self.images.get("common_bg"))
-        if bg_img: 
-            self.game_canvas.blit(bg_img, (0, 0))
-        else: 
-            self.game_canvas.fill((50, 50, 80))
-
-        # 2. タイル描画（チャプターごとに切り替え）
-        all_draw_targets = [
-            {"list": self.map_mgr.draw_tiles, "is_brick": False}, 
-            {"list": self.map_mgr.bricks, "is_brick": True},
-            {"list": self.map_mgr.pushable_blocks, "is_brick": False},
-            {"list": self.map_mgr.keys, "is_brick": True},
-            {"list": self.map_mgr.doors, "is_brick": True},
-            {"list": self.map_mgr.large_only_tiles, "type": "L", "is_brick": False},
-            {"list": self.map_mgr.small_only_tiles, "type": "R", "is_brick": False}
-        ]
-
-        for target in all_draw_targets:
-            # 透明度のフラグ判定（ターゲットごとに1回だけ実施）
-            tile_type = target.get("type")
-            is_faded = False
-            if tile_type == "L" and not self.player.is_big: is_faded = True
-            elif tile_type == "R" and self.player.is_big: is_faded = True
-
-            for item in target["list"]:
-                # データ型を特定して rect と img_key を抽出
-                if isinstance(item, dict):
-                    img_key = item.get("img_key", target.get("img_key"))
-                    rect = item["rect"] if "rect" in item else pygame.Rect(*item["pos"], 64, 64)
-                elif hasattr(item, "img_key"):
-                    img_key = item.img_key
-                    rect = item.rect
-                else:
-                    img_key = target.get("img_key")
-                    rect = item
-
-                # 画像検索
-                img = self.images.get(f"{chapter}_{img_key}", 
-                                    self.images.get(f"common_{img_key}", 
-                                    self.images.get(img_key)))
-                
-                if img:
-                    pos = (rect.x + OFFSET_X, rect.y + OFFSET_Y)
-                    
-                    # ブラウザ最適化：copy()を避け、必要な時だけset_alphaを適用
-                    # ※頻繁に切り替わる場合は、あらかじめ半透明画像を作っておくのが理想
-                    if is_faded:
-                        img.set_alpha(80)
-                    else:
-                        img.set_alpha(255)
-                        
-                    self.game_canvas.blit(img, pos)
-
-        # 3. チュートリアル
+        self.key_layout.draw(surface, buttons)
+
+    def _play_scene_layers(self):
+        """プレイ画面の背景と、その上に重ねるタイル・チュートリアルを (Surface, 位置) で返す"""
+        # 1. 背景＋動かないタイル（ロード時に焼き込み済み）
+        static = self.static_layer
+
+        # 2. 動的なタイル（画像と描画位置は create_map で解決済み）
+        mm = self.map_mgr
+        tiles = [(b["img"], b["blit_pos"]) for b in mm.bricks if b["img"]]
+        tiles += [(pb.img, (pb.rect.x + OFFSET_X, pb.rect.y + OFFSET_Y))
+                  for pb in mm.pushable_blocks if pb.img]
+        for records in (mm.keys, mm.doors):
+            tiles += [(r["img"], r["blit_pos"]) for r in records if r["img"]]
+        # L/R ブロックは最後（従来どおり一番上）に。今の大きさで実体化しない方は焼き込み済みの半透明版を使う
+        for records, is_faded in ((mm.large_only_tiles, not self.player.is_big),
+                                  (mm.small_only_tiles, self.player.is_big)):
+            img_field = "img_faded" if is_faded else "img"
+            tiles += [(r[img_field], r["blit_pos"]) for r in records if r[img_field]]
+
+        # 3. チュートリアル（透明度が変わった時だけ合成し直す）
+        tutorial = None
         if self.current_tutorial:
             current_a = int(self.tutorial_alpha)
-            text_a = min(255, current_a + 50) 
-            
-            rect_width = 620
-            line_spacing = 10
-            padding = 20
-            h = (padding * 2) + (len(self.current_tutorial) * (20 + line_spacing))
-            
-            # オーバーレイSurfaceの生成
-            # ※本来は一度作ったSurfaceをクラス変数に保持し、リサイズ時のみ作り直すのが最速
-            overlay = pygame.Surface((rect_width, h), pygame.SRCALPHA)
-            overlay.fill((20, 20, 20, current_a)) 
-            pygame.draw.rect(overlay, (200, 200, 150, current_a), (0, 0, rect_width, h), 2)
-            
-            pos_x, pos_y = (800 - rect_width) // 2, 100
-            self.game_canvas.blit(overlay, (pos_x, pos_y))
-            
-            # テキスト描画
-            for i, line in enumerate(self.current_tutorial):
-                txt = self.font_s.render(line, True, (255, 215, 0))
-                txt.set_alpha(text_a)
-                self.game_canvas.blit(txt, (pos_x + padding, pos_y + padding + i * (20 + line_spacing)))
+            if current_a != self._tutorial_frame_alpha:
+                self._tutorial_frame = self._compose_tutorial_frame(current_a)
+                self._tutorial_frame_alpha = current_a
+            tutorial = (self._tutorial_frame, self._tutorial_pos)
+        return static, tiles, tutorial
+
+    def draw_play_scene(self, dt):
+        static, tiles, tutorial = self._play_scene_layers()
+        self.game_canvas.blit(static, (0, 0))
+        self.game_canvas.fblits(tiles)
+        if tutorial:
+            self.game_canvas.blit(*tutorial, special_flags=pygame.BLEND_PREMULTIPLIED)
         
         # 4. プレイヤーとUIの描画
         self.player.draw(self.game_canvas, self.images, dt)
-        self.draw_candy_ui()
-        self.draw_key_ui()
-                
+        self.hud.draw(self.game_canvas)
+
+        # 次のフレームで差分描画するための基準として、今回描いた内容を記録する
+        dr = self.dirty_regions
+        dr.invalidate()
+        sprite = self.player.get_sprite(self.images)
+        if DIRTY_RECT_UPDATES and sprite and self.player.state != "CLEAR" and not self.is_cleared:
+            dr.report("tiles", tiles)
+            dr.report("tutorial", [tutorial] if tutorial else [])
+            dr.report("player", [sprite])
+            dr.rects.clear()
+            dr.static = static
+            dr.valid = True
+
+    def draw_play_scene_dirty(self):
+        """
+        前フレームから変わった範囲だけを描き直し、その範囲（キャンバス座標）のリストを返す。
+        差分で描けない場合（背景が変わった等）は何もせず None を返す。
+        """
+        dr = self.dirty_regions
+        static, tiles, tutorial = self._play_scene_layers()
+        sprite = self.player.get_sprite(self.images)
+        if static is not dr.static or not sprite:
+            return None
+
+        dr.report("tiles", tiles)
+        dr.report("tutorial", [tutorial] if tutorial else [])
+        dr.report("player", [sprite])
+        if self.hud.update():
+            dr.add(self.hud.rect)
+        rects = dr.collect()
+
+        # 変わった範囲ごとに、背景から重ね順どおりに描き直す（範囲外はクリップで守る）
+        canvas = self.game_canvas
+        for area in rects:
+            canvas.set_clip(area)
+            canvas.blit(static, area, area)
+            canvas.fblits(tiles)
+            if tutorial:
+                canvas.blit(*tutorial, special_flags=pygame.BLEND_PREMULTIPLIED)
+            canvas.blit(*sprite)
+            canvas.blit(self.hud.surface, self.hud.rect)
+        canvas.set_clip(None)
+        return rects
+
+    def _can_draw_dirty(self, window_size):
+        """このフレームを差分描画できるか（できない場合は全体を描いて flip する）"""
+        if self.viewport.update(window_size):
+            self.dirty_regions.invalidate()  # 画面サイズが変わった
+        return (DIRTY_RECT_UPDATES and self.dirty_regions.valid
+                and self.scene == "PLAYING" and not self.is_paused and not self.is_cleared
+                and not self.is_touch_device          # 仮想キーは実画面に直接描くため
+                and self._prof is None                # 処理時間のオーバーレイも同じく
+                and self.viewport.scaled is None)     # 拡縮して貼る場合は全体を貼り直す
+
     def draw(self, dt):
-        self.game_canvas.fill((135, 206, 235)) # 背景色など
+        # 固定ステップの物理の間を補間した位置で描く
+        with self.interpolator.apply(self._interpolated_objects(), self.render_alpha):
+            self._draw_frame(dt)
 
-        if self.scene == "SELECT":
+    def _draw_frame(self, dt):
+        # ポーズ中は止まったゲーム画面を焼き込み済みの1枚で済ませる
+        if not self.is_paused:
+            self._pause_backdrop = None
+
+        # 差分描画できるフレームは変わった範囲だけを描き直す
+        window_w, window_h = pygame.display.get_surface().get_size()
+        dirty_rects = None
+        if self._can_draw_dirty((window_w, window_h)):
+            dirty_rects = self.draw_play_scene_dirty()
+
+        if dirty_rects is not None:
+            pass
+        elif self._pause_backdrop is not None:
+            self.dirty_regions.invalidate()
+        elif self.scene == "SELECT":
+            self.dirty_regions.invalidate()
+            self.game_canvas.fill((135, 206, 235)) # 背景色など
             self.draw_select_menu()
         else:
+            self.game_canvas.fill((135, 206, 235)) # 背景色など
             self.draw_play_scene(dt)  # プレイ画面の描画（背景、タイル、キャラ）
 
             if self.is_cleared:
                 # --- ステージクリアの豪華演出 ---
-                import math
-
                 # 1. クリアした瞬間の時間を記録（一度だけ）
                 if not hasattr(self, 'clear_start_ticks') or self.clear_start_ticks == 0:
                     self.clear_start_ticks = pygame.time.get_ticks()
@@ -1060,89 +1277,52 @@ class Game:
                 # 2. 経過時間の計算（秒単位、リセットなしの連続値）
                 elapsed_time = (pygame.time.get_ticks() - self.clear_start_ticks) / 1000.0
 
-                # 3. 背後の後光（強烈な発光）
-                glow_center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-                # 登場時のインパクト演出：0.5秒かけて1.5倍から1.0倍に収束しつつ、その後パルス
-                entrance_impact = max(0, 1.0 * math.exp(-elapsed_time * 5)) # 急激に減衰する値
-                pulse_scale = 1.0 + entrance_impact + 0.1 * math.sin(elapsed_time * 8)
-
-                for r in range(1, 15):
-                    alpha = int(100 * (0.7 ** r))
-                    # 経過時間によるフェードイン
-                    alpha = int(alpha * min(1.0, elapsed_time * 2))
-                    
-                    glow_surf = pygame.Surface((300 + r*20, 100 + r*10), pygame.SRCALPHA)
-                    glow_color = (255, 200 + r*3, 50, alpha)
-                    pygame.draw.ellipse(glow_surf, glow_color, glow_surf.get_rect())
-                    
-                    # 滑らかなスケーリング
-                    s_w = int(glow_surf.get_width() * pulse_scale)
-                    s_h = int(glow_surf.get_height() * pulse_scale)
-                    scaled_glow = pygame.transform.smoothscale(glow_surf, (s_w, s_h))
-                    self.game_canvas.blit(scaled_glow, scaled_glow.get_rect(center=glow_center))
-
-                # 4. メインテキスト "STAGE CLEAR!"
-                # テキストも後光と同期してパルス
-                text_scale = pulse_scale
-                
-                # 本体
-                base_txt = self.font_l.render("STAGE CLEAR!", True, (255, 255, 100))
-                w, h = base_txt.get_size()
-                scaled_txt = pygame.transform.smoothscale(base_txt, (int(w * text_scale), int(h * text_scale)))
-                
-                # シャドウ（本体と同じスケールで描画）
-                shadow_txt = self.font_l.render("STAGE CLEAR!", True, (50, 20, 0))
-                shadow_txt = pygame.transform.smoothscale(shadow_txt, (int(w * text_scale), int(h * text_scale)))
-                
-                txt_rect = scaled_txt.get_rect(center=glow_center)
-                # シャドウを少しずらして描画
-                self.game_canvas.blit(shadow_txt, (txt_rect.x + 4, txt_rect.y + 4))
-                self.game_canvas.blit(scaled_txt, txt_rect)
+                # 3. 後光とテキスト（描画済みのフレームを使い回す）
+                self.clear_effect.draw(self.game_canvas, elapsed_time, (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
             
         if self.is_paused:
+            self.dirty_regions.invalidate()
             self.draw_pause_menu()  # プレイ画面の上に設定を重ねる
+        prof = self._prof
+        if prof: prof.lap("draw")
+
+        if dirty_rects is not None:
+            # 変わった範囲だけを実画面へ貼り、その範囲だけを更新する
+            rects = self.viewport.present_rects(self.screen, self.game_canvas, dirty_rects)
+            if prof: prof.lap("present")
+            pygame.display.update(rects)
+            if prof: prof.lap("flip")
+            return
 
-        # --- 比率を維持したスケーリング ---
-        # 現在のウィンドウサイズを取得
-        window_w, window_h = pygame.display.get_surface().get_size()
-        
-        # 拡大倍率を計算（幅と高さの小さい方に合わせる）
-        scale = min(window_w / self.BASE_WIDTH, window_h / self.BASE_HEIGHT)
-        new_size = (int(self.BASE_WIDTH * scale), int(self.BASE_HEIGHT * scale))
-        
-        # キャンバスをスケーリング
-        scaled_canvas = pygame.transform.smoothscale(self.game_canvas, new_size)
-        
-        # 中央に配置するためのオフセット計算
-        self.offset_x = (window_w - new_size[0]) // 2
-        self.offset_y = (window_h - new_size[1]) // 2
-        self.current_scale = scale # 座標計算用に保存
-        
-        # 実画面をクリアして貼り付け
-        self.screen.fill((20, 20, 20)) # 背景（黒帯部分の色）
-        self.screen.blit(scaled_canvas, (self.offset_x, self.offset_y))
+        # --- 比率を維持したスケーリング（倍率・拡縮先はウィンドウサイズが変わった時だけ作り直す） ---
+        self.viewport.present(self.screen, self.game_canvas)
         
         # 仮想キーを「実画面」に直接描画
         if self.is_touch_device:
             self.draw_virtual_keys(self.screen, window_w, window_h)
+        if prof:
+            prof.lap("present")
+            self.profiler.draw(self.screen)
+            prof.lap("overlay")
 
         pygame.display.flip()
+        if prof: prof.lap("flip")
 
-    def handle_transformation(self):
+    def handle_transformation(self, hold):
         # アイテムがあるかチェック
         if self.candy_count > 0:
             old_bottom = self.player.rect.bottom # 変更前の足元の位置を保持
             if not self.player.is_big:
                 # --- 大きくなる時の予測判定 ---
-                keys = pygame.key.get_pressed()
-                dx = 5 * (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT])
+                # 押している方向は（キーボードを直接見ずに）入力状態から取る：記録した入力の再生でも同じ結果になるように
+                dx = 5 * (bool(hold["right"]) - bool(hold["left"]))
                 preview_rect = self.player.rect.copy()
                 preview_rect.height = 96
                 preview_rect.x += dx 
                 preview_rect.bottom = old_bottom
                 
                 # 判定対象：通常の壁 + レンガ + 「大きくなった時に実体化するLタイル」
-                obstacles = self.map_mgr.tiles + self.map_mgr.bricks + self.map_mgr.doors + self.map_mgr.large_only_tiles
+                obstacles = self.map_mgr.query(preview_rect, "static", "bricks", "doors", "large_only")
                 block_rects = [{'rect': pb.rect} for pb in self.map_mgr.pushable_blocks]
                 all_collision_targets = obstacles + block_rects
                 
@@ -1157,12 +1337,12 @@ class Game:
                     self.player.rect.height = 96
                     self.player.rect.bottom = preview_rect.bottom
                     self.player.pos_y = float(self.player.rect.y)
-                    self.sounds['change_big'].play()
+                    if 'change_big' in self.sounds: self.sounds['change_big'].play()
                     self.candy_count -= 1
                     self.player.change_count += 1
 
                     # すり抜け床の上にいた場合の補正 床の上に合わせる
-                    for p in self.map_mgr.platforms:
+                    for p in self.map_mgr.query(self.player.rect, "platforms"):
                         if self.player.rect.colliderect(p):
                             if abs(self.player.rect.bottom - p.top) < 10:
                                 self.player.rect.bottom = p.top
@@ -1176,7 +1356,7 @@ class Game:
                 preview_rect.bottom = old_bottom
                 
                 # 判定対象：通常の壁 + レンガ + 「小さくなった時に実体化するRタイル」
-                obstacles = self.map_mgr.tiles + self.map_mgr.bricks + self.map_mgr.small_only_tiles
+                obstacles = self.map_mgr.query(preview_rect, "static", "bricks", "small_only")
                 
                 can_shrink = True
                 for obs in obstacles:
@@ -1189,11 +1369,11 @@ class Game:
                     self.player.rect.height = 64
                     self.player.rect.bottom = old_bottom
                     self.player.pos_y = float(self.player.rect.y) # 明示的に座標更新
-                    self.sounds['change_small'].play()
+                    if 'change_small' in self.sounds: self.sounds['change_small'].play()
                     self.candy_count -= 1
                     self.player.change_count += 1
                     # (以下すり抜け床補正)
-                    for p in self.map_mgr.platforms:
+                    for p in self.map_mgr.query(self.player.rect.inflate(0, 20), "platforms"):
                         if self.player.rect.right > p.left and self.player.rect.left < p.right:
                             if abs(self.player.rect.bottom - p.top) < 10:
                                 self.player.rect.bottom = p.top
@@ -1209,29 +1389,16 @@ class Game:
         if not surface:
             return (0, 0)
 
-        # 現在の実画面サイズとスケールを再計算
+        # 現在の実画面サイズ
         window_w, window_h = surface.get_size()
         
         # window_w や window_h が 0 の場合、または計算不能な場合の安全策
         if window_w <= 0 or window_h <= 0:
             return (0, 0)
 
-        scale = min(window_w / self.BASE_WIDTH, window_h / self.BASE_HEIGHT)
-        
-        # scale が 0 にならないようにチェック
-        if scale <= 0:
-            return (0, 0)
-        
-        offset_x = (window_w - (self.BASE_WIDTH * scale)) // 2
-        offset_y = (window_h - (self.BASE_HEIGHT * scale)) // 2
-        
-        raw_x, raw_y = pygame.mouse.get_pos()
-        
-        # 論理座標（800x600）に変換
-        logical_x = (raw_x - offset_x) / scale
-        logical_y = (raw_y - offset_y) / scale
-        
-        return (logical_x, logical_y)
+        # 描画と同じ倍率・オフセットで論理座標（800x600）に変換
+        self.viewport.update((window_w, window_h))
+        return self.viewport.to_logical(pygame.mouse.get_pos())
 
     # #######################################################################################
     # INPUT SYSTEM
@@ -1257,22 +1424,21 @@ class Game:
         # 2. タッチによるホールド判定
         # 素早い切り替えで active_fingers が一瞬空になっても、
         # 判定が途切れないようループを確実に回す
+        layout = self.key_layout
         for f_pos in list(active_fingers.values()):
+            hits = layout.hit(f_pos)
+            if not hits:
+                continue
             # 移動ボタン：ここが True になり続けることが重要
-            if self.btn_left.collidepoint(f_pos):   h["left"] = True
-            if self.btn_right.collidepoint(f_pos):  h["right"] = True
-            if self.btn_down.collidepoint(f_pos):   h["down"] = True
-            
             # アクションボタン：ジャンプしながら移動しやすくする
-            if self.btn_jump.collidepoint(f_pos):   h["jump"] = True
-            if self.btn_change.collidepoint(f_pos): h["change"] = True
+            for name in ("left", "right", "down", "jump", "change"):
+                if name in hits: h[name] = True
 
-        # 3. マウス判定
-        if pygame.mouse.get_pressed()[0]:
-            m_pos = raw_mouse_pos
-            if self.btn_left.collidepoint(m_pos):   h["left"] = True
-            if self.btn_right.collidepoint(m_pos):  h["right"] = True
-            if self.btn_jump.collidepoint(m_pos):   h["jump"] = True
+        # 3. マウス判定（仮想キーを出している時だけ。出ていない所を押しても反応させない）
+        if self.is_touch_device and pygame.mouse.get_pressed()[0]:
+            hits = layout.hit(raw_mouse_pos)
+            for name in ("left", "right", "jump"):
+                if name in hits: h[name] = True
 
     def _handle_events(self, e, active_fingers, window_size, input_state):
         window_w, window_h = window_size
@@ -1281,6 +1447,8 @@ class Game:
         
         if e.type in (pygame.FINGERDOWN, pygame.FINGERMOTION):
             self.is_touch_device = True
+            # 最初のタッチで仮想キーの配置を確定させる（以降はサイズが変わった時だけ）
+            self.key_layout.ensure(window_size)
             f_pos = (e.x * window_w, e.y * window_h)
             active_fingers[e.finger_id] = f_pos 
             
@@ -1289,22 +1457,23 @@ class Game:
                     # 非同期で最小限の準備を実行
                     asyncio.create_task(self.warmup_sounds())
                 
-                if self.btn_esc.collidepoint(f_pos):
+                hits = self.key_layout.hit(f_pos)
+                if "esc" in hits:
                     self.is_paused = not self.is_paused
                 
-                if not self.is_paused:
+                if not self.is_paused and hits:
                     # --- 瞬間(trigger)と継続(hold)を同時にセット ---
                     # これにより素早い指の入れ替えでも1フレームの空白を作らない
-                    if self.btn_left.collidepoint(f_pos):
+                    if "left" in hits:
                         t["left"] = h["left"] = True
-                    if self.btn_right.collidepoint(f_pos):
+                    if "right" in hits:
                         t["right"] = h["right"] = True
-                    if self.btn_up.collidepoint(f_pos):
+                    if "up" in hits:
                         t["up"] = True
-                    if self.btn_down.collidepoint(f_pos):
+                    if "down" in hits:
                         t["down"] = h["down"] = True
 
-                    if self.btn_jump.collidepoint(f_pos):
+                    if "jump" in hits:
                         if self.is_cleared:
                             # クリア時は「OK」ボタンとして機能
                             self.scene = "SELECT"
@@ -1313,13 +1482,13 @@ class Game:
                             # 通常時はジャンプ
                             t["jump"] = t["enter"] = h["jump"] = True
                     
-                    if self.btn_change.collidepoint(f_pos):
+                    if "change" in hits:
                         t["change"] = h["change"] = True
                     
                     # システムボタン
-                    if self.btn_reload.collidepoint(f_pos): 
+                    if "reload" in hits: 
                         self.load_stage(self.current_stage_id)
-                    if self.btn_menu.collidepoint(f_pos):
+                    if "menu" in hits:
                         self.scene = "SELECT"
                         self.is_cleared = False
 
@@ -1327,11 +1496,22 @@ class Game:
             # 指が離れたときのみ削除
             active_fingers.pop(e.finger_id, None)
 
+        elif e.type == pygame.VIDEORESIZE:
+            # ウィンドウサイズが変わったら仮想キーの配置を作り直し（仮想キーを出している時だけ）、次の描画は全体を貼り直す
+            if self.is_touch_device:
+                self.key_layout.ensure(e.size)
+            self.dirty_regions.invalidate()
+        elif e.type == pygame.VIDEOEXPOSE:
+            self.dirty_regions.invalidate()
+
         # --- キーボード処理（略） ---
         elif e.type == pygame.KEYDOWN:
             if e.key == pygame.K_ESCAPE:
                 self.is_paused = not self.is_paused
                 self.slider_dragging = None
+            elif self.is_paused and e.key == pygame.K_v:
+                # ポーズ中の V: 画面の拡縮方法を切り替える（なめらか → 整数倍 → 拡縮なし）
+                self.viewport.next_mode()
             elif not self.is_paused:
                 if e.key == pygame.K_LEFT:   t["left"] = True
                 if e.key == pygame.K_RIGHT:  t["right"] = True
@@ -1348,6 +1528,7 @@ class Game:
                 # Debug Keys
                 if DEBUG_MODE:
                     if e.key == pygame.K_F1:  self.launch_editor()
+                    if e.key == pygame.K_F10: self.toggle_profiler()
                     if DEBUG_MODE and e.key == pygame.K_F11:
                             if self.current_stage_id != "SELECT":
                                 self.is_cleared = True
@@ -1358,6 +1539,7 @@ class Game:
                                 # すでに記録がある場合は維持、ない場合は「クリア済み」として999をセット
                                 if self.current_stage_id not in self.cleared_stages:
                                     self.cleared_stages[self.current_stage_id] = 999
+                                    self.progress_version += 1
                                 
                                 self.save_game()  # ステージ進捗を保存
                                 
@@ -1374,29 +1556,28 @@ class Game:
 
     def _handle_touch_trigger(self, f_x, f_y, window_size, trigger):
         """タッチした瞬間の判定（triggerに集約）"""
-        if self.btn_esc.collidepoint((f_x, f_y)):
+        hits = self.key_layout.hit((f_x, f_y))
+        if "esc" in hits:
             self.is_paused = not self.is_paused
             return
 
         if not self.is_paused:
             # 共通移動系
-            if self.btn_left.collidepoint((f_x, f_y)):   trigger["left"] = True
-            if self.btn_right.collidepoint((f_x, f_y)):  trigger["right"] = True
-            if self.btn_up.collidepoint((f_x, f_y)):     trigger["up"] = True
-            if self.btn_down.collidepoint((f_x, f_y)):   trigger["down"] = True
+            for name in ("left", "right", "up", "down"):
+                if name in hits: trigger[name] = True
             
             # ジャンプ / 決定
-            if self.btn_jump.collidepoint((f_x, f_y)):
+            if "jump" in hits:
                 trigger["enter"] = True # セレクト画面用
                 trigger["jump"] = True  # プレイ画面用
             
             # 切り替え
-            if self.btn_change.collidepoint((f_x, f_y)):
+            if "change" in hits:
                 trigger["change"] = True
             
             # 即時実行
-            if self.btn_reload.collidepoint((f_x, f_y)): self.load_stage(self.current_stage_id)
-            if self.btn_menu.collidepoint((f_x, f_y)):
+            if "reload" in hits: self.load_stage(self.current_stage_id)
+            if "menu" in hits:
                 self.scene = "SELECT"
                 self.is_cleared = False
 
@@ -1446,6 +1627,70 @@ class Game:
                 self.scene = "PLAYING"
                 self.load_stage(self.current_stage_id)
 
+    def _reset_simulation(self):
+        """固定ステップの持ち越し・補間・描画差分をリセットする（ステージ読み込み時など）"""
+        self.sim_accumulator = 0.0
+        self.render_alpha = 1.0
+        self.interpolator.reset()
+        self._pending_trigger = self._create_empty_input_state()["trigger"]
+        self.dirty_regions.invalidate()
+
+    def _start_recording(self, stage_id):
+        """記録中なら、それまでのプレイを保存して新しいステージの記録を始める"""
+        if not self.record_dir:
+            return
+        self._save_recording()
+        self.recorder = InputRecorder(stage_id, self.sim_hz)
+
+    def _save_recording(self):
+        if not self.recorder or not len(self.recorder):
+            return
+        os.makedirs(self.record_dir, exist_ok=True)
+        self._record_count += 1
+        name = f"{self.recorder.stage_id}_{time.strftime('%Y%m%d-%H%M%S')}_{self._record_count}.rep"
+        path = os.path.join(self.record_dir, name)
+        try:
+            self.recorder.save(path)
+            print(f"入力を記録しました: {path} ({len(self.recorder)} frames)")
+        except OSError as e:
+            print(f"入力の記録に失敗: {e}")
+        self.recorder = None
+
+    def _interpolated_objects(self):
+        return [self.player] + self.map_mgr.pushable_blocks
+
+    def _step_playing_scene(self, inputs, dt):
+        """
+        プレイ中の物理を sim_hz の固定ステップで進める（フレームレートによってジャンプの高さ等が変わらないように）。
+        瞬間入力は最初のステップでだけ使い、ステップが0回のフレームでは次のフレームへ持ち越す。
+        実際に進めたステップ数を返す。
+        """
+        step = 1.0 / self.sim_hz
+        trigger = self._pending_trigger
+        for name, pressed in inputs["trigger"].items():
+            if pressed: trigger[name] = True
+
+        self.sim_accumulator += dt
+        steps = 0
+        while self.sim_accumulator >= step:
+            if steps >= MAX_SIM_STEPS:
+                # 追いつけない分は捨てる
+                self.sim_accumulator = 0.0
+                break
+            self.interpolator.snapshot(self._interpolated_objects())
+            self._update_playing_scene({"hold": inputs["hold"], "trigger": trigger}, step)
+            trigger = self._create_empty_input_state()["trigger"]
+            self.sim_accumulator -= step
+            steps += 1
+            if self.scene != "PLAYING" or self.is_cleared:
+                self.sim_accumulator = 0.0
+                break
+
+        self._pending_trigger = trigger
+        # 描画は「前のステップ → 今のステップ」の間を、余った時間の割合で補間する
+        self.render_alpha = self.sim_accumulator / step
+        return steps
+
     def _update_playing_scene(self, inputs, dt):
         """プレイ中の更新処理（継続と瞬間を使い分け）"""
         if self.is_cleared: return
@@ -1455,7 +1700,7 @@ class Game:
         
         # アクション (瞬間入力を使用)
         if inputs["trigger"]["jump"]:   self.perform_jump()
-        if inputs["trigger"]["change"]: self.handle_transformation()
+        if inputs["trigger"]["change"]: self.handle_transformation(inputs["hold"])
 
         # チュートリアルのアルファ制御
         self._update_tutorial_alpha(inputs, dt)
@@ -1515,14 +1760,33 @@ class Game:
     # #######################################################################################
     # MAIN LOOP
     # #######################################################################################
+    def _is_idle(self, had_input, active_fingers):
+        """
+        入力がなく、動きもない待機画面か。そうなら描画頻度を落として良い。
+        クリア演出（ダンス・後光）と、セレクト画面の CLEAR 表示のパルスは入力がなくても動き続けるので対象外。
+        """
+        now = time.perf_counter()
+        if had_input or active_fingers or self.slider_dragging:
+            self.last_activity = now
+            return False
+        if self.is_paused:
+            still = True
+        elif self.scene == "SELECT":
+            still = not self._select_menu_badges
+        else:
+            still = False  # プレイ中・クリア演出中
+        return still and now - self.last_activity >= IDLE_DELAY
+
     async def run(self):
         active_fingers = {}
-        clock = pygame.time.Clock()
+        dt = 1 / 60.0
 
         while True:
-            # デルタタイム（経過時間）の取得
-            dt = clock.tick() / 1000.0 # 制限をかけず、かかった時間だけを計測
-            if dt > 0.1: dt = 1/60.0 # 画面切り替え時などの極端なラグでの突き抜け防止
+            # デルタタイム（経過時間）は前フレームの frame_pacer.wait が返した値
+            # 当たり判定は連続判定、極端なラグは MAX_SIM_STEPS で打ち切るので dt はそのまま使う
+
+            prof = self._prof
+            if prof: prof.start_frame()
 
             window_size = pygame.display.get_surface().get_size()
             raw_mouse_pos = pygame.mouse.get_pos()
@@ -1531,12 +1795,20 @@ class Game:
             input_state = self._create_empty_input_state()
 
             # 2. イベント処理（キーボードのtriggerと指の最新座標を収集）
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: return
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    if DEBUG_MODE:
+                        print(f"フレーム制御: {self.frame_pacer.summary()}")
+                    self._save_recording()
+                    return
                 self._handle_events(event, active_fingers, window_size, input_state)
+            prof = self._prof  # F10 で切り替わった場合
+            if prof: prof.lap("events")
             
             # 3. 入力の統合（ホールド判定）
             self._update_touch_input(active_fingers, input_state, raw_mouse_pos)
+            if prof: prof.lap("touch")
 
             # シーン振り分け
             if self.is_paused:
@@ -1544,15 +1816,27 @@ class Game:
             elif self.scene == "SELECT":
                 self._update_select_scene(input_state, dt)
             elif self.scene == "PLAYING":
-                self._update_playing_scene(input_state, dt)
+                if self.recorder:
+                    # 記録した値（μs に丸めた dt）で進めることで、再生時と同じ結果になる
+                    dt = self.recorder.record(input_state, dt)
+                self._step_playing_scene(input_state, dt)
+            if prof: prof.lap("sim")
 
             self.draw(dt)
-            await asyncio.sleep(0)
+            # 次のフレームまで待つ（ブラウザ上では描画フレームに合わせて制御を返すだけ）
+            dt = await self.frame_pacer.wait(self._is_idle(bool(events), active_fingers))
 
-async def main():
+async def main(record_dir=None):
     
     game = Game()
+    game.record_dir = record_dir  # --record DIR: プレイ中の入力を記録する
     await game.run()  # runメソッドがasyncであることを確認
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = sys.argv[1:]
+    if "--headless" in args or "--replay" in args:
+        # ウィンドウなしで物理演算だけを回す・記録した入力を再生する（引数は headless.py を参照）
+        import headless
+        sys.exit(headless.main(args))
+    record_dir = args[args.index("--record") + 1] if "--record" in args[:-1] else None
+    asyncio.run(main(record_dir))
\ No newline at end of file
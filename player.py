@@ -1,6 +1,59 @@
 import pygame
 import math # サイン波計算用
-from settings import SCREEN_HEIGHT, OFFSET_X, OFFSET_Y, GRAVITY
+from settings import SCREEN_HEIGHT, OFFSET_X, OFFSET_Y, GRAVITY, GRID_SIZE
+from render_cache import SurfaceCache
+from collision import first_contact
+
+FLIP_WIDTH_STEP = 4      # 向き反転アニメーションの表示幅の刻み (px)
+SPRITE_CACHE_SIZE = 128  # 反転・拡縮済みスプライトの保持上限
+DANCE_FRAMES = 64        # クリア時ダンス1周期あたりの焼き込みフレーム数
+DANCE_SHEAR = 30         # ダンスの左右への最大ズレ幅 (px)
+
+
+class DanceAnimator:
+    """
+    クリア時ダンス（伸縮＋足元を軸にした平行四辺形変形）を、
+    dance_timer の1周期(2π)ぶんあらかじめ焼いておき、毎フレーム1回の blit で描く。
+    """
+
+    def __init__(self, frame_count=DANCE_FRAMES):
+        self.frame_count = frame_count
+        self.frames = []  # [(Surface, curr_h), ...]
+        self.key = None
+
+    def _build(self, img, base_w, base_h, facing_right):
+        self.frames = []
+        # 向きに合わせて反転したものを元にする
+        flipped = pygame.transform.flip(img, not facing_right, False)
+        pad = DANCE_SHEAR + 1
+        for n in range(self.frame_count):
+            t = 2 * math.pi * n / self.frame_count
+            stretch_y = 1.0 + math.sin(t * 2.0 + 1) * 0.5
+            shear_x = math.cos(t * 1.0) * DANCE_SHEAR
+
+            curr_h = max(1, int(base_h * stretch_y))
+            scaled = pygame.transform.scale(flipped, (base_w, curr_h))
+            frame = pygame.Surface((base_w + pad * 2, curr_h), pygame.SRCALPHA)
+            # 足元を軸に平行四辺形変形（焼き込み時に一度だけスライス描画）
+            for i in range(curr_h):
+                # 上にいくほど大きくずらす (足元 i=curr_h-1 でズレ0)
+                offset_x = shear_x * (1 - i / curr_h)
+                frame.blit(scaled, (pad + offset_x, i), (0, i, base_w, 1))
+            self.frames.append((frame, curr_h))
+
+    def draw(self, screen, img, rect, dance_timer, facing_right):
+        base_w, base_h = rect.width, rect.height
+        key = (id(img), base_w, base_h, facing_right)
+        if key != self.key:
+            self._build(img, base_w, base_h, facing_right)
+            self.key = key
+
+        n = int(dance_timer / (2 * math.pi) * self.frame_count) % self.frame_count
+        frame, curr_h = self.frames[n]
+        # 描画位置：足元の中心を軸に計算
+        draw_x = (rect.centerx - base_w // 2) + OFFSET_X - (DANCE_SHEAR + 1)
+        draw_y = rect.bottom + OFFSET_Y - curr_h
+        screen.blit(frame, (draw_x, draw_y))
 
 class Player:
     def __init__(self, x, y):
@@ -19,13 +72,37 @@ class Player:
         self.on_ground = False # 接地フラグを追加
         self.air_timer = 0.0
         self.change_count = 0
+        # (画像キー, 向き, 幅, 高さ) -> 反転・拡縮済みの Surface
+        self.sprite_cache = SurfaceCache(SPRITE_CACHE_SIZE)
+        self.dance_animator = DanceAnimator()
+
+    def sweep_area(self, dt):
+        """今回の update で到達しうる範囲（衝突候補を絞り込むための AABB）"""
+        frame_ratio = dt * 60.0
+        expected_h = 92 if self.is_big else 60
+        start = pygame.Rect(int(self.pos_x + 4), int(self.pos_y), 56, expected_h)
+        start.union_ip(self.rect)
+
+        # 垂直方向の移動量（update と同じ式）と、左右移動の最大量
+        dy = self.vel_y * frame_ratio + 0.5 * GRAVITY * frame_ratio * frame_ratio
+        dx = int(5.0 * frame_ratio) + 1
+        area = start.union(start.move(0, int(dy)))
+        # 押し戻しで移動前より手前に戻るケースも拾えるよう、余裕を持たせる
+        return area.inflate((dx + GRID_SIZE * 2) * 2, GRID_SIZE * 4)
 
     def update(self, keys, tiles, platforms, dt):
         if self.state == "CLEAR":
             # クリア後は物理演算（重力以外）を停止、または速度を0にする
             self.vel_y += GRAVITY * dt * 60 # 60fpsベースの定数なら調整が必要
+            start = self.rect.copy()
             self.pos_y += self.vel_y * dt
             self.rect.y = int(self.pos_y)
+
+            hit = first_contact(start, self.rect, tiles)
+            if hit and self.vel_y > 0:
+                self.rect.bottom = hit.top
+                self.pos_y = float(self.rect.y)
+                self.vel_y = 0
             
             for t in tiles:
                 if self.rect.colliderect(t['rect']):
@@ -68,8 +145,19 @@ class Player:
 
         # --- 横方向の移動と衝突判定 ---
         if dx_val != 0:
+            start = temp_rect.copy()
             self.pos_x += dx_val
             temp_rect.x = int(self.pos_x + 4)
+
+            # 移動の途中で最初に触れる壁で止める（dt が大きくても薄い壁をすり抜けない）
+            hit = first_contact(start, temp_rect, tiles)
+            if hit:
+                if dx_val > 0:
+                    temp_rect.right = hit.left
+                else:
+                    temp_rect.left = hit.right
+                self.pos_x = float(temp_rect.x - 4)
+
             for obs in tiles:
                 if temp_rect.colliderect(obs['rect']):
                     if dx_val > 0: 
@@ -81,6 +169,7 @@ class Player:
                     self.pos_x = float(temp_rect.x - 4)
         
         # 2.垂直方向（ジャンプ・落下）の判定
+        start = temp_rect.copy()
         self.pos_y += self.vel_y * frame_ratio
 
         # この1フレーム間の重力による加速分を計算
@@ -98,6 +187,17 @@ class Player:
             self.air_timer += dt # 秒で加算
         self.on_ground = False 
 
+        # 移動の途中で最初に触れる床・天井で止める
+        hit = first_contact(start, temp_rect, tiles)
+        if hit:
+            if temp_rect.y > start.y: # 落下中：着地
+                temp_rect.bottom = hit.top
+                self.on_ground = True
+            else: # 上昇中：頭打ち
+                temp_rect.top = hit.bottom
+            self.vel_y = 0
+            self.pos_y = float(temp_rect.y)
+
         for obs in tiles:
             if temp_rect.colliderect(obs['rect']):
                 if self.vel_y > 0: # 落下中：着地
@@ -112,14 +212,14 @@ class Player:
 
         # 2-2. すり抜け床（プラットフォーム）
         if not keys.get(pygame.K_DOWN, False) and self.vel_y >= 0:
-            # 今回の移動で通過したであろう距離（前回の足元位置を推測）
-            prev_bottom = temp_rect.bottom - (self.vel_y * frame_ratio)
+            # 今回の移動で通過した範囲（移動前から移動後まで）
+            sweep = start.union(temp_rect)
             
             for p in platforms:
-                if temp_rect.colliderect(p):
-                    # 1. 移動前(prev_bottom)が床の上端(p.top)より上にあった
-                    # 2. 現在の足元(temp_rect.bottom)が床の上端より下にある
-                    if prev_bottom <= p.top + 2: # +2は浮動小数点誤差の遊び
+                if sweep.colliderect(p):
+                    # 1. 移動前の足元(start.bottom)が床の上端(p.top)より上にあった
+                    # 2. 移動中に床の上端を通過した（通過範囲が床と重なる）
+                    if start.bottom <= p.top + 2: # +2は浮動小数点誤差の遊び
                         temp_rect.bottom = p.top
                         self.pos_y = float(temp_rect.y)
                         self.vel_y = 0
@@ -131,6 +231,25 @@ class Player:
         self.rect.size = temp_rect.size
         self.rect.topleft = temp_rect.topleft
 
+    def _flip_width(self, base_w):
+        """向き反転アニメーション中の表示幅（FLIP_WIDTH_STEP 刻みに量子化）"""
+        curr_w = max(1, int(base_w * abs(self.flip_progress)))
+        return min(base_w, -(-curr_w // FLIP_WIDTH_STEP) * FLIP_WIDTH_STEP)
+
+    def _get_sprite(self, img_key, p_img, w, base_w, h):
+        key = (img_key, self.facing_right, w, h)
+        sprite = self.sprite_cache.get(key)
+        if sprite is None:
+            # 初めての組み合わせなら、反転アニメーションで使う幅をまとめて作っておく
+            flipped = pygame.transform.flip(p_img, not self.facing_right, False)
+            widths = list(range(FLIP_WIDTH_STEP, base_w, FLIP_WIDTH_STEP)) + [base_w]
+            for qw in widths:
+                qkey = (img_key, self.facing_right, qw, h)
+                if qkey not in self.sprite_cache:
+                    self.sprite_cache.put(qkey, pygame.transform.scale(flipped, (qw, h)))
+            sprite = self.sprite_cache.get(key)
+        return sprite
+
     def draw(self, screen, images, dt):
         base_w, base_h = self.rect.width, self.rect.height
         img_key = 'player_big' if self.is_big else 'player_small'
@@ -139,44 +258,29 @@ class Player:
             img_key = 'player_smile'
             self.dance_timer += 6.0 * dt # 1秒間に約1サイクル
             
-            # クリア時のダンス
-            stretch_y = 1.0 + math.sin(self.dance_timer * 2.0 + 1) * 0.5
-            shear_x = math.cos(self.dance_timer * 1.0) * 30 # 左右への最大ズレ幅
-            
-            curr_h = int(base_h * stretch_y)
+            # クリア時のダンス（1周期ぶん焼き込み済みのフレームを使う）
             p_img = images.get(img_key)
             if p_img:
-                # 向きに合わせて反転したあと、現在の伸縮サイズにリサイズ
-                p_img = pygame.transform.flip(p_img, not self.facing_right, False)
-                p_img = pygame.transform.scale(p_img, (base_w, curr_h))
-                
-                # 足元を軸に平行四辺形変形（スライス描画）
-                for i in range(curr_h):
-                    # 上にいくほど大きくずらす (足元 i=curr_h-1 でズレ0)
-                    offset_x = shear_x * (1 - i / curr_h)
-                    
-                    # 1ピクセル分の横細のスライスを取得
-                    line_rect = pygame.Rect(0, i, base_w, 1)
-                    
-                    # 描画位置：足元の中心を軸に計算
-                    draw_x = (self.rect.centerx - base_w // 2) + OFFSET_X + offset_x
-                    draw_y = (self.rect.bottom + OFFSET_Y - curr_h) + i
-                    
-                    screen.blit(p_img, (draw_x, draw_y), line_rect)
-                return # スライス描画したのでここで終了
+                self.dance_animator.draw(screen, p_img, self.rect, self.dance_timer, self.facing_right)
+                return
 
         # --- 通常時の描画 (NORMAL) ---
-        curr_w = max(1, int(base_w * abs(self.flip_progress)))
-        p_x = (self.rect.centerx - curr_w // 2) + OFFSET_X
-        p_y = self.rect.y + OFFSET_Y
-        p_img = images.get(img_key)
-        if p_img:
-            curr_w = max(1, int(base_w * abs(self.flip_progress)))
-            f = pygame.transform.flip(p_img, not self.facing_right, False)
-            s = pygame.transform.scale(f, (curr_w, base_h))
-            # 常に自身のrectの中心を軸に描画することで震えを防ぐ
-            draw_x = self.rect.centerx - (curr_w // 2) + OFFSET_X
-            draw_y = self.rect.y + OFFSET_Y
-            screen.blit(s, (draw_x, draw_y))
+        sprite = self.get_sprite(images)
+        if sprite:
+            screen.blit(*sprite)
         else:
-            pygame.draw.rect(screen, (0, 120, 255), (self.rect.x + OFFSET_X, self.rect.y + OFFSET_Y, self.rect.width, base_h))
\ No newline at end of file
+            pygame.draw.rect(screen, (0, 120, 255), (self.rect.x + OFFSET_X, self.rect.y + OFFSET_Y, self.rect.width, base_h))
+
+    def get_sprite(self, images):
+        """通常時に描く (Surface, 描画位置) を返す。画像がない場合は None"""
+        base_w, base_h = self.rect.width, self.rect.height
+        img_key = 'player_big' if self.is_big else 'player_small'
+        p_img = images.get(img_key)
+        if not p_img:
+            return None
+        curr_w = self._flip_width(base_w)
+        s = self._get_sprite(img_key, p_img, curr_w, base_w, base_h)
+        # 常に自身のrectの中心を軸に描画することで震えを防ぐ
+        draw_x = self.rect.centerx - (curr_w // 2) + OFFSET_X
+        draw_y = self.rect.y + OFFSET_Y
+        return s, (draw_x, draw_y)
\ No newline at end of file
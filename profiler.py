@@ -0,0 +1,134 @@
+import time
+from collections import deque
+
+import pygame
+
+# 計測する区間（表示順）と表示名。区間は FrameProfiler.lap を呼んだ位置で区切られる
+PHASES = (
+    ("events", "events"),          # イベント処理
+    ("touch", "touch input"),      # _update_touch_input
+    ("player", "update: player"),  # Game.update の中：プレイヤー物理（当たり判定の取り出し込み）
+    ("gizmos", "update: gizmos"),  # 頭突き・鍵・ドア
+    ("blocks", "update: blocks"),  # 押せるブロック
+    ("sim", "update: other"),      # 固定ステップの管理・ゴール判定・セレクト/ポーズ画面の更新
+    ("draw", "draw scene"),        # draw_play_scene / セレクト・ポーズ画面・クリア演出
+    ("present", "present"),        # 実画面への拡縮・仮想キー
+    ("overlay", "overlay"),        # このオーバーレイ自体
+    ("flip", "flip"),              # display.flip / update
+    ("wait", "wait"),              # 次のフレームまでの待機
+)
+
+WINDOW = 1.0          # FPS・最悪値・平均を出す期間（秒）
+PANEL_INTERVAL = 0.25  # 文字を描き直す間隔（秒）
+GRAPH_SIZE = (240, 60)
+GRAPH_MAX_MS = 50.0    # グラフの上端
+GUIDE_MS = (1000 / 60, 1000 / 30)  # 60fps / 30fps の目安線
+MARGIN = 8
+LINE_HEIGHT = 16
+
+
+class FrameProfiler:
+    """
+    フレームの区間ごとの処理時間を計り、画面右上に重ねて表示する（デバッグ用）。
+    呼び出し側は Game._prof（無効時は None）を見て `if prof: prof.lap("名前")` と書くので、
+    無効の間は None の判定だけで時間は計らない。
+    """
+
+    def __init__(self, history=240):
+        self.enabled = False
+        self.frames = deque(maxlen=history)  # [(終了時刻, フレーム間隔, {区間: 秒}), ...]
+        self.current = {}
+        self.frame_start = None
+        self.last = 0.0
+        self.font = None
+        self.panel = None
+        self.panel_time = 0.0
+        self.graph = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.frames.clear()
+        self.current = {}
+        self.frame_start = None  # 途中から計り始めたフレームは捨てる
+        self.last = time.perf_counter()
+        self.panel = None
+        return self.enabled
+
+    def start_frame(self):
+        """メインループの先頭で呼ぶ。前のフレームを（待機時間込みで）締める"""
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.current["wait"] = self.current.get("wait", 0.0) + now - self.last
+            self.frames.append((now, now - self.frame_start, self.current))
+        self.current = {}
+        self.frame_start = self.last = now
+
+    def lap(self, name):
+        """前回の lap からの経過時間を name の区間に足す（1フレームに何度呼んでも良い）"""
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0) + now - self.last
+        self.last = now
+
+    def stats(self):
+        """直近 WINDOW 秒の (FPS, 最悪のフレーム間隔, {区間: 平均秒}) を返す"""
+        if not self.frames:
+            return 0.0, 0.0, {}
+        since = self.frames[-1][0] - WINDOW
+        recent = [f for f in self.frames if f[0] > since]
+        span = recent[-1][0] - recent[0][0] + recent[0][1]
+        totals = {}
+        for _, _, phases in recent:
+            for name, sec in phases.items():
+                totals[name] = totals.get(name, 0.0) + sec
+        averages = {name: sec / len(recent) for name, sec in totals.items()}
+        return len(recent) / span if span > 0 else 0.0, max(f[1] for f in recent), averages
+
+    def _build_panel(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        fps, worst, averages = self.stats()
+        work = sum(sec for name, sec in averages.items() if name != "wait")
+        lines = [(f"FPS {fps:.1f}", f"worst {worst * 1000:.1f} ms"),
+                 ("work / frame", f"{work * 1000:.2f} ms")]
+        lines += [(label, f"{averages.get(name, 0.0) * 1000:.2f} ms") for name, label in PHASES]
+
+        w = GRAPH_SIZE[0]
+        panel = pygame.Surface((w, LINE_HEIGHT * len(lines) + MARGIN), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, (label, value) in enumerate(lines):
+            color = (255, 255, 120) if i < 2 else (230, 230, 230)
+            y = MARGIN // 2 + i * LINE_HEIGHT
+            panel.blit(self.font.render(label, True, color), (MARGIN, y))
+            txt = self.font.render(value, True, color)
+            panel.blit(txt, (w - MARGIN - txt.get_width(), y))
+        return panel
+
+    def _draw_graph(self):
+        """直近のフレーム間隔を折れ線で描く（Surface は使い回す）"""
+        if self.graph is None:
+            self.graph = pygame.Surface(GRAPH_SIZE, pygame.SRCALPHA)
+        g = self.graph
+        w, h = GRAPH_SIZE
+        g.fill((0, 0, 0, 170))
+        for ms in GUIDE_MS:
+            y = h - 1 - int(ms / GRAPH_MAX_MS * (h - 1))
+            pygame.draw.line(g, (90, 90, 90), (0, y), (w, y))
+
+        intervals = [f[1] for f in self.frames][-w // 2:]
+        if len(intervals) >= 2:
+            step = w / (self.frames.maxlen // 2)
+            points = [(i * step, h - 1 - min(h - 1, int(sec * 1000 / GRAPH_MAX_MS * (h - 1))))
+                      for i, sec in enumerate(intervals)]
+            pygame.draw.lines(g, (120, 255, 120), False, points)
+        return g
+
+    def draw(self, surface):
+        """surface（実画面）の右上にオーバーレイを描く"""
+        now = time.perf_counter()
+        if self.panel is None or now - self.panel_time >= PANEL_INTERVAL:
+            self.panel = self._build_panel()
+            self.panel_time = now
+
+        x = surface.get_width() - GRAPH_SIZE[0] - MARGIN
+        surface.blit(self.panel, (x, MARGIN))
+        surface.blit(self._draw_graph(), (x, MARGIN + self.panel.get_height()))
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+
+class SurfaceCache:
+    """変換・描画済みの Surface を保持する上限付き LRU キャッシュ"""
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def clear(self):
+        self.entries.clear()
+
+    def get(self, key):
+        surf = self.entries.get(key)
+        if surf is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return surf
+
+    def put(self, key, surf):
+        self.entries[key] = surf
+        self.entries.move_to_end(key)
+        # 上限を超えたら最も長く使われていないものから捨てる
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        surf = self.get(key)
+        if surf is None:
+            surf = factory()
+            self.put(key, surf)
+        return surf
+
+
+class TextCache(SurfaceCache):
+    """
+    font.render の結果を (フォント, 文字列, 色, アンチエイリアス) ごとに使い回す LRU キャッシュ。
+    返した Surface は共有されるので、呼び出し側で set_alpha などを書き換えないこと
+    （透明度が必要な場合は alpha を指定すると、その透明度を適用した別の Surface を返す）。
+    """
+
+    def __init__(self, max_size=256):
+        super().__init__(max_size)
+
+    def render(self, font, text, antialias, color, alpha=None):
+        """引数の並びは font.render に合わせている"""
+        key = (font, text, tuple(color), antialias, alpha)
+        surf = self.get(key)
+        if surf is None:
+            if alpha is None:
+                surf = font.render(text, antialias, color)
+            else:
+                surf = self.render(font, text, antialias, color).copy()
+                surf.set_alpha(alpha)
+            self.put(key, surf)
+        return surf
@@ -0,0 +1,182 @@
+"""
+プレイ中の入力（毎フレームの hold / trigger フラグ）と dt の記録・再生。
+
+ファイル形式（リトルエンディアン）:
+  b"SSRP" | version:u8 | sim_hz:u16 | len:u8 + ステージID(utf-8) | フレーム数:u32
+  フラグ列: ラン数:u32, [ラン長:varint, フラグ:u16] * ラン数   （1フレーム12bit。同じ入力が続く間は1ランにまとまる）
+  dt 列  : ラン数:u32, [ラン長:varint, dt(μs):varint] * ラン数
+dt はマイクロ秒に丸めて記録し、記録中のゲームにも丸めた値を使わせるので、再生すると同じ結果になる。
+"""
+import struct
+
+MAGIC = b"SSRP"
+VERSION = 1
+HOLD_FLAGS = ("left", "right", "down", "jump", "change")
+TRIGGER_FLAGS = ("left", "right", "up", "down", "enter", "jump", "change")
+
+
+def _write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _run_length(values):
+    """[a, a, a, b] -> [[3, a], [1, b]]"""
+    runs = []
+    for v in values:
+        if runs and runs[-1][1] == v:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, v])
+    return runs
+
+
+def pack_flags(input_state):
+    hold, trigger = input_state["hold"], input_state["trigger"]
+    bits = 0
+    for i, name in enumerate(HOLD_FLAGS):
+        if hold.get(name):
+            bits |= 1 << i
+    for i, name in enumerate(TRIGGER_FLAGS):
+        if trigger.get(name):
+            bits |= 1 << (len(HOLD_FLAGS) + i)
+    return bits
+
+
+def unpack_flags(bits):
+    hold = {name: bool(bits & (1 << i)) for i, name in enumerate(HOLD_FLAGS)}
+    trigger = {name: bool(bits & (1 << (len(HOLD_FLAGS) + i))) for i, name in enumerate(TRIGGER_FLAGS)}
+    return {"hold": hold, "trigger": trigger}
+
+
+class InputRecorder:
+    """1回のプレイ（ステージ読み込みから次の読み込みまで）の入力と dt を記録する"""
+
+    def __init__(self, stage_id, sim_hz):
+        self.stage_id = stage_id
+        self.sim_hz = sim_hz
+        self.flags = []
+        self.dts = []  # マイクロ秒
+
+    def __len__(self):
+        return len(self.flags)
+
+    def record(self, input_state, dt):
+        """1フレーム分を記録し、ゲームが使うべき dt（記録した丸め値）を返す"""
+        dt_us = max(0, round(dt * 1_000_000))
+        self.flags.append(pack_flags(input_state))
+        self.dts.append(dt_us)
+        return dt_us / 1_000_000
+
+    def to_bytes(self):
+        stage = self.stage_id.encode("utf-8")
+        out = bytearray(MAGIC)
+        out += struct.pack("<BHB", VERSION, self.sim_hz, len(stage)) + stage
+        out += struct.pack("<I", len(self.flags))
+
+        flag_runs = _run_length(self.flags)
+        out += struct.pack("<I", len(flag_runs))
+        for count, bits in flag_runs:
+            _write_varint(out, count)
+            out += struct.pack("<H", bits)
+
+        dt_runs = _run_length(self.dts)
+        out += struct.pack("<I", len(dt_runs))
+        for count, dt_us in dt_runs:
+            _write_varint(out, count)
+            _write_varint(out, dt_us)
+        return bytes(out)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+class InputReplay:
+    """記録ファイルを読み込み、同じ入力と dt でプレイ画面の更新を再生する"""
+
+    def __init__(self, stage_id, sim_hz, flags, dts):
+        self.stage_id = stage_id
+        self.sim_hz = sim_hz
+        self.flags = flags
+        self.dts = dts
+
+    def __len__(self):
+        return len(self.flags)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("入力記録ファイルではありません")
+        version, sim_hz, stage_len = struct.unpack_from("<BHB", data, 4)
+        if version != VERSION:
+            raise ValueError(f"未対応のバージョンです: {version}")
+        pos = 8
+        stage_id = data[pos:pos + stage_len].decode("utf-8")
+        pos += stage_len
+        (frame_count,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+
+        flags = []
+        (run_count,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        for _ in range(run_count):
+            count, pos = _read_varint(data, pos)
+            (bits,) = struct.unpack_from("<H", data, pos)
+            pos += 2
+            flags.extend([bits] * count)
+
+        dts = []
+        (run_count,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        for _ in range(run_count):
+            count, pos = _read_varint(data, pos)
+            dt_us, pos = _read_varint(data, pos)
+            dts.extend([dt_us] * count)
+
+        if len(flags) != frame_count or len(dts) != frame_count:
+            raise ValueError("入力記録ファイルが壊れています")
+        return cls(stage_id, sim_hz, flags, dts)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def frames(self):
+        """(input_state, dt) を記録順に返す"""
+        for bits, dt_us in zip(self.flags, self.dts):
+            yield unpack_flags(bits), dt_us / 1_000_000
+
+    def play(self, game):
+        """
+        game で記録したステージを読み込み、記録どおりの入力と dt でプレイ画面を更新する。
+        実際に進めた物理のステップ数を返す（MAX_SIM_STEPS で打ち切られた分は含まない。クリアした所で止める）。
+        """
+        game.sim_hz = self.sim_hz
+        game.scene = "PLAYING"
+        game.is_paused = False
+        game.load_stage(self.stage_id)
+        steps = 0
+        for input_state, dt in self.frames():
+            if game.is_cleared:
+                break  # クリア後のフレームでは物理は進まない
+            steps += game._step_playing_scene(input_state, dt)
+        return steps
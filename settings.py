@@ -3,10 +3,19 @@ import pygame
 GRID_SIZE = 32
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
-FPS = 60
+FPS = 60              # 目標フレームレート（0 で上限なし）
+IDLE_FPS = 20         # 入力のない待機画面（セレクト・ポーズ・クリア）でのフレームレート
+IDLE_DELAY = 1.0      # 最後の入力から待機扱いにするまでの秒数
+VSYNC = True          # 使える環境では垂直同期を有効にする
+SIM_HZ = 120          # 物理演算の固定ステップ（描画のフレームレートとは独立）
+WEB_SIM_HZ = 60       # ブラウザ（pygbag）上での物理ステップ。当たり判定は連続判定なので粗くしてもすり抜けない
+MAX_SIM_STEPS = 8     # 1フレームで進める物理ステップの上限（処理落ち時に追いつこうとして更に重くならないように）
 GRAVITY = 0.8  # もしくは現在お使いの重力の値
 OFFSET_X = -GRID_SIZE // 2
 OFFSET_Y = -GRID_SIZE // 2
+MERGE_STATIC_TILES = True  # 連続した床・壁をロード時に大きな当たり判定へまとめる
+SCALE_MODE = "smooth"  # 画面の拡縮方法: "smooth"（なめらか）/ "nearest"（整数倍・軽い）/ "none"（拡縮なし）
+DIRTY_RECT_UPDATES = False  # 変わった範囲だけを描き直して display.update(rects) する（拡縮時・画面サイズ変更時は全体を flip）
 
 TILE_TYPES = {
     'S': {"img": None, "w": 2, "h": 2},            # 開始位置
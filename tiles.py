@@ -1,8 +1,16 @@
 import pygame
-from settings import GRID_SIZE, TILE_TYPES
+from settings import GRID_SIZE, TILE_TYPES, MERGE_STATIC_TILES, OFFSET_X, OFFSET_Y
+from collision import CollisionWorld, merge_solid_rects
+
+def resolve_image(images, chapter, img_key):
+    """チャプター専用画像 -> 共通画像 -> キーそのまま の順で画像を探す"""
+    return images.get(f"{chapter}_{img_key}",
+                      images.get(f"common_{img_key}",
+                      images.get(img_key)))
 
 class MapManager:
-    def __init__(self):
+    def __init__(self, merge_static_tiles=MERGE_STATIC_TILES):
+        self.merge_static_tiles = merge_static_tiles
         self.tiles = []
         self.draw_tiles = []
         self.goal_tiles = []
@@ -17,7 +25,27 @@ class MapManager:
         self.large_only_tiles = [] # 'L' の Rect リスト
         self.small_only_tiles = [] # 'R' の Rect リスト
 
-    def create_map(self, map_data):
+        # 衝突判定用のレイヤー付きワールド（空間インデックスを内部に持つ）
+        self.world = CollisionWorld()
+
+    def query(self, area, *layers):
+        """area (AABB) と重なる矩形を、指定したレイヤーの順に連結して返す"""
+        return self.world.query(area, *layers)
+
+    def remove_brick(self, brick):
+        self.bricks.remove(brick)
+        self.world.mark_dirty(CollisionWorld.BRICKS)
+
+    def remove_door(self, door):
+        self.doors.remove(door)
+        self.world.mark_dirty(CollisionWorld.DOORS)
+
+    def create_map(self, map_data, chapter="common", images=None):
+        """
+        images を渡すと、描画用レコードに解決済みの画像('img')と描画位置('blit_pos')を付けておく。
+        （描画側で毎フレーム画像キーを組み立てて探さずに済むように）
+        """
+        images = images or {}
         self.tiles.clear()
         self.draw_tiles.clear()
         self.goal_tiles.clear()
@@ -50,6 +78,8 @@ class MapManager:
         for wall_rect in invisible_walls:
             # tilesに追加するが、draw_tilesには追加しない（＝判定はあるが見えない）
             self.tiles.append({'rect': wall_rect})
+
+        solid_rects = [] # 通常の壁・床の当たり判定（最後にまとめて tiles へ追加）
         
         for r_idx, row in enumerate(map_data):
             for c_idx, cell in enumerate(row):
@@ -64,6 +94,8 @@ class MapManager:
 
                     rect = pygame.Rect(x, y, cfg["w"]*GRID_SIZE, cfg["h"]*GRID_SIZE)
                     img_key = cfg["img"]
+                    img = resolve_image(images, chapter, img_key) if img_key else None
+                    blit_pos = (x + OFFSET_X, y + OFFSET_Y)
 
                     # プレイヤー開始地点の判定
                     if cell == 'S':
@@ -74,42 +106,58 @@ class MapManager:
                     
                     # 破壊可能ブロック
                     if cell == 'B' or cell == 4:
-                        self.bricks.append({'rect': rect, 'img_key': img_key})
+                        self.bricks.append({'rect': rect, 'img_key': img_key, 'img': img, 'blit_pos': blit_pos})
                     
                     # ゴール
                     elif cell == 'G' or cell == 9:
                         self.goal_tiles.append(rect)
-                        self.draw_tiles.append({"img_key": img_key, "pos": (x, y)})
+                        self.draw_tiles.append({"img_key": img_key, "pos": (x, y), "img": img, "blit_pos": blit_pos})
                         
                     # すり抜け床
                     elif cell == 'P' or cell == 3:
                         self.platforms.append(rect)
-                        self.draw_tiles.append({"img_key": img_key, "pos": (x, y)})
+                        self.draw_tiles.append({"img_key": img_key, "pos": (x, y), "img": img, "blit_pos": blit_pos})
                         
                     # 押せるブロック
                     elif cell == 'M' or cell == 5:
                         from game_objects import PushableBlock
-                        self.pushable_blocks.append(PushableBlock(x, y, img_key))
+                        self.pushable_blocks.append(PushableBlock(x, y, img_key, img))
                     
                     # 鍵 (Key) 
                     elif cell == 'K':
-                        self.keys.append({'rect': rect, 'img_key': img_key})
+                        self.keys.append({'rect': rect, 'img_key': img_key, 'img': img, 'blit_pos': blit_pos})
                     
                     # ドア (Door)
                     elif cell == 'D':
-                        self.doors.append({'rect': rect, 'img_key': img_key})
+                        self.doors.append({'rect': rect, 'img_key': img_key, 'img': img, 'blit_pos': blit_pos})
                     
                     # 赤ブロック
                     elif cell == 'L':
                         # 判定用リストに入れつつ、描画用にも追加
-                        self.large_only_tiles.append({'rect': rect, "img_key": img_key})
+                        self.large_only_tiles.append({'rect': rect, 'img_key': img_key, 'img': img, 'blit_pos': blit_pos,
+                                                      'img_faded': resolve_image(images, chapter, f"{img_key}_faded")})
                     
                     # 青ブロック
                     elif cell == 'R':
                         # 判定用リストに入れつつ、描画用にも追加
-                        self.small_only_tiles.append({'rect': rect, "img_key": img_key})
+                        self.small_only_tiles.append({'rect': rect, 'img_key': img_key, 'img': img, 'blit_pos': blit_pos,
+                                                      'img_faded': resolve_image(images, chapter, f"{img_key}_faded")})
 
                     # 通常の壁・床 ('F', 'W', 1, 2 など)
                     else:
-                        self.tiles.append({'rect': rect})
-                        self.draw_tiles.append({"img_key": img_key, "pos": (x, y)})
\ No newline at end of file
+                        solid_rects.append(rect)
+                        self.draw_tiles.append({"img_key": img_key, "pos": (x, y), "img": img, "blit_pos": blit_pos})
+
+        # 当たり判定用：連続した床・壁は大きな矩形にまとめる（描画は draw_tiles のまま1枚ずつ）
+        if self.merge_static_tiles:
+            solid_rects = merge_solid_rects(solid_rects)
+        self.tiles.extend({'rect': r} for r in solid_rects)
+
+        self.world.reset({
+            CollisionWorld.STATIC: self.tiles,
+            CollisionWorld.BRICKS: self.bricks,
+            CollisionWorld.DOORS: self.doors,
+            CollisionWorld.PLATFORMS: self.platforms,
+            CollisionWorld.LARGE_ONLY: self.large_only_tiles,
+            CollisionWorld.SMALL_ONLY: self.small_only_tiles,
+        }, self.pushable_blocks)
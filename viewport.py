@@ -0,0 +1,103 @@
+import pygame
+
+SCALE_SMOOTH = "smooth"    # 比率を保ったなめらかな拡縮（従来どおり）
+SCALE_NEAREST = "nearest"  # 整数倍の最近傍拡大（ドットがくっきり・軽い）
+SCALE_NONE = "none"        # 拡縮なし（1:1 で中央に配置。最も軽い）
+SCALE_MODES = (SCALE_SMOOTH, SCALE_NEAREST, SCALE_NONE)
+
+BORDER_COLOR = (20, 20, 20)  # 黒帯部分の色
+
+
+class Viewport:
+    """
+    論理キャンバス（800x600）を実ウィンドウへ貼り付けるための変換。
+    倍率・オフセット・拡縮先の Surface はウィンドウサイズかモードが変わった時だけ作り直し、
+    毎フレームは確保済みの Surface へ拡縮して貼るだけにする。
+    """
+
+    def __init__(self, base_size, mode=SCALE_SMOOTH):
+        self.base_w, self.base_h = base_size
+        self.mode = mode if mode in SCALE_MODES else SCALE_SMOOTH
+        self.window_size = None
+        self.scale = 1.0
+        self.rect = pygame.Rect((0, 0), base_size)  # キャンバスを貼る実画面上の範囲
+        self.borders = []    # rect の外側（黒帯）の Rect
+        self.scaled = None   # 拡縮先（拡縮しない場合は None）
+
+    def set_mode(self, mode):
+        if mode not in SCALE_MODES or mode == self.mode:
+            return
+        self.mode = mode
+        self.window_size = None  # 次の update で作り直す
+
+    def next_mode(self):
+        self.set_mode(SCALE_MODES[(SCALE_MODES.index(self.mode) + 1) % len(SCALE_MODES)])
+
+    def update(self, window_size):
+        """ウィンドウサイズが変わっていれば配置を計算し直す。計算し直した場合は True を返す"""
+        window_size = tuple(window_size)
+        if window_size == self.window_size:
+            return False
+        self.window_size = window_size
+        window_w, window_h = window_size
+
+        # 拡大倍率（幅と高さの小さい方に合わせる）
+        fit = min(window_w / self.base_w, window_h / self.base_h)
+        if self.mode == SCALE_NONE or fit <= 0:
+            scale = 1.0
+        elif self.mode == SCALE_NEAREST and fit >= 1:
+            scale = float(int(fit))  # 整数倍にしてドットの大きさを揃える
+        else:
+            scale = fit
+
+        size = (int(self.base_w * scale), int(self.base_h * scale))
+        self.scale = scale
+        # 中央に配置するためのオフセット
+        self.rect = pygame.Rect(((window_w - size[0]) // 2, (window_h - size[1]) // 2), size)
+
+        # キャンバスと同じ大きさなら拡縮せずそのまま貼る
+        if size == (self.base_w, self.base_h) or size[0] <= 0 or size[1] <= 0:
+            self.scaled = None
+        elif self.scaled is None or self.scaled.get_size() != size:
+            self.scaled = pygame.Surface(size)
+
+        window = pygame.Rect(0, 0, window_w, window_h)
+        r = self.rect
+        self.borders = [b for b in (
+            pygame.Rect(0, 0, window_w, r.top),                          # 上
+            pygame.Rect(0, r.bottom, window_w, window_h - r.bottom),     # 下
+            pygame.Rect(0, r.top, r.left, r.height),                     # 左
+            pygame.Rect(r.right, r.top, window_w - r.right, r.height),   # 右
+        ) if b.width > 0 and b.height > 0 and b.colliderect(window)]
+        return True
+
+    def present(self, screen, canvas):
+        """canvas を screen へ貼る（黒帯も塗り直す）"""
+        self.update(screen.get_size())
+        for border in self.borders:
+            screen.fill(BORDER_COLOR, border)
+
+        if self.scaled is None:
+            screen.blit(canvas, self.rect)
+            return
+        if self.mode == SCALE_SMOOTH:
+            pygame.transform.smoothscale(canvas, self.rect.size, self.scaled)
+        else:
+            pygame.transform.scale(canvas, self.rect.size, self.scaled)
+        screen.blit(self.scaled, self.rect)
+
+    def present_rects(self, screen, canvas, rects):
+        """
+        拡縮なし（1:1）の時に、canvas の rects の範囲だけを screen へ貼る。
+        貼った範囲（実画面座標）のリストを返すので、そのまま display.update に渡せる。
+        """
+        ox, oy = self.rect.topleft
+        moved = [r.move(ox, oy) for r in rects]
+        screen.blits([(canvas, dest, area) for dest, area in zip(moved, rects)], doreturn=False)
+        return moved
+
+    def to_logical(self, pos):
+        """実画面上の座標を論理座標（800x600）に変換する"""
+        if self.window_size is None or self.scale <= 0:
+            return (0, 0)
+        return ((pos[0] - self.rect.x) / self.scale, (pos[1] - self.rect.y) / self.scale)
@@ -0,0 +1,95 @@
+import pygame
+
+KEY_MARGIN = 20
+KEY_SIZE = (90, 90)      # 移動・アクションボタン（重なりを防ぐため100から90pxに調整）
+SYSTEM_KEY_SIZE = (60, 60)
+KEY_GAP = 15             # ボタン同士の隙間
+KEY_RADIUS = 15
+
+
+class VirtualKeyLayout:
+    """
+    タッチ端末用の仮想キー。ボタンの配置と見た目（スキン）はウィンドウサイズごとに一度だけ作り、
+    毎フレームは出来上がったスキンを貼るだけにする。
+    当たり判定もここでまとめて行い、押されているボタン名の集合を返す。
+    """
+
+    def __init__(self, font, text_cache):
+        self.font = font
+        self.text_cache = text_cache
+        self.size = None
+        self.rects = {}   # ボタン名 -> Rect（実画面座標）
+        self.zones = []   # [(グループ全体の Rect, [(ボタン名, Rect), ...]), ...]
+        self.skins = {}   # (幅, 高さ, ラベル) -> Surface
+
+    def ensure(self, window_size):
+        """ウィンドウサイズが変わっていれば配置を作り直す。作り直した場合は True を返す"""
+        window_size = tuple(window_size)
+        if window_size == self.size:
+            return False
+        self._build(*window_size)
+        self.size = window_size
+        return True
+
+    def _build(self, screen_w, screen_h):
+        margin, gap = KEY_MARGIN, KEY_GAP
+        bw, bh = KEY_SIZE
+        sw, sh = SYSTEM_KEY_SIZE
+        bottom = screen_h - bh - margin
+
+        # 左側（移動）：「下」を中央、「左」「右」をその両脇に配置（逆T字）
+        # 「上」は必要なシーンでのみ使用（配置は左と右の間、一段上）
+        left_cluster = {
+            "left":  pygame.Rect(margin, bottom, bw, bh),
+            "down":  pygame.Rect(margin + bw + gap, bottom, bw, bh),
+            "right": pygame.Rect(margin + (bw + gap) * 2, bottom, bw, bh),
+            "up":    pygame.Rect(margin + bw + gap, bottom - bh - gap, bw, bh),
+        }
+        # 右側（アクション）：Jumpを右端、Changeをその隣に配置（横並び）
+        right_cluster = {
+            "jump":   pygame.Rect(screen_w - bw - margin, bottom, bw, bh),
+            "change": pygame.Rect(screen_w - (bw * 2) - margin - gap, bottom, bw, bh),
+        }
+        # システム系（画面上部）
+        top_bar = {
+            "menu":   pygame.Rect(margin, margin, sw, sh),
+            "esc":    pygame.Rect((screen_w - sw) / 2, margin, sw, sh),
+            "reload": pygame.Rect(screen_w - sw - margin, margin, sw, sh),
+        }
+
+        self.rects = {}
+        self.zones = []
+        for group in (left_cluster, right_cluster, top_bar):
+            self.rects.update(group)
+            rects = list(group.values())
+            self.zones.append((rects[0].unionall(rects[1:]), list(group.items())))
+
+    def hit(self, pos):
+        """pos に重なっているボタン名の集合を返す（グループ単位で先に振り落とす）"""
+        found = set()
+        for zone, members in self.zones:
+            if zone.collidepoint(pos):
+                for name, rect in members:
+                    if rect.collidepoint(pos):
+                        found.add(name)
+        return found
+
+    def _skin(self, rect, label):
+        key = (rect.width, rect.height, label)
+        skin = self.skins.get(key)
+        if skin is None:
+            skin = pygame.Surface(rect.size, pygame.SRCALPHA)
+            # 枠と背景の透明度を少し上げて、ゲーム画面を見やすく調整
+            pygame.draw.rect(skin, (255, 255, 255, 40), skin.get_rect(), border_radius=KEY_RADIUS)
+            text_surf = self.text_cache.render(self.font, label, True, (255, 255, 255))
+            skin.blit(text_surf, text_surf.get_rect(center=(rect.width // 2, rect.height // 2)))
+            # 実画面（アルファなし）に描いていた枠線と同じ見た目になるよう不透明で焼き込む
+            pygame.draw.rect(skin, (255, 255, 255), skin.get_rect(), 2, border_radius=KEY_RADIUS)
+            self.skins[key] = skin
+        return skin
+
+    def draw(self, surface, buttons):
+        """buttons: [(ボタン名, ラベル), ...]"""
+        rects = self.rects
+        surface.fblits([(self._skin(rects[name], label), rects[name].topleft)
+                        for name, label in buttons])